@@ -0,0 +1,51 @@
+# Generations per second of LSystem.run_from (compiled rewrite plan / expansion cache) compared with the former
+# implementation (one re.sub with a python callback per iteration) for every curve in curves.py.
+#
+#   $ python -m benchmarks.bench_lsystem [--repeat 3]
+import argparse
+import re
+import timeit
+
+from lsystems import curves
+
+# depth per curve, chosen such that the final generation has a few million symbols
+DEPTHS = {
+    curves.Sierpinski: 14,
+    curves.Dragon: 21,
+    curves.Hilbert: 10,
+    curves.FractalPeano: 6,
+    curves.Hendragon: 7,
+    curves.Hendragon2: 8,
+    curves.FractalPlant: 9,
+}
+
+
+def legacy_run_from(rules: dict, initial_string: str, number_of_iterations: int) -> str:
+    current_string = initial_string
+    for _ in range(number_of_iterations):
+        pattern = re.compile('|'.join([re.escape(x) for x in rules.keys()]))
+        current_string = pattern.sub(lambda x: rules[x.group(0)], current_string)
+    return current_string
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'curve':<14}{'depth':>6}{'length':>12}{'legacy gen/s':>15}{'cold gen/s':>13}{'warm gen/s':>13}"
+          f"{'speedup':>9}")
+    for curve_class, depth in DEPTHS.items():
+        lsys = curve_class().lsys
+        assert lsys.run(depth) == legacy_run_from(lsys.rules, lsys.start_symbol, depth)
+        legacy = min(timeit.repeat(lambda: legacy_run_from(lsys.rules, lsys.start_symbol, depth),
+                                   number=1, repeat=args.repeat))
+        # cold: the expansion cache is emptied before every run, warm: everything is served from the cache
+        cold = min(timeit.repeat(lambda: lsys.run(depth), setup=lsys.cache.clear, number=1, repeat=args.repeat))
+        warm = min(timeit.repeat(lambda: lsys.run(depth), number=1, repeat=args.repeat))
+        print(f"{curve_class.__name__:<14}{depth:>6}{len(lsys.run(depth)):>12}"
+              f"{depth / legacy:>15.2f}{depth / cold:>13.2f}{depth / warm:>13.2f}{legacy / cold:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Movements per second of the scalar turtle layer in svg.py: generate (returns a new cursor and the svg segment)
+# compared with advance (moves the cursor in place) for Line, Rotation, Arc and push/pop pairs.
+#
+#   $ python -m benchmarks.bench_movements [--number 200000] [--repeat 3]
+import argparse
+import timeit
+
+from lsystems.svg import Cursor, Line, Rotation, Arc, PushPosition, PopPosition
+
+
+def movement_cases():
+    stack = []
+    push, pop = PushPosition(stack=stack), PopPosition(stack=stack)
+    return {
+        'Line': [Line(length=5)],
+        'Line (pen up)': [Line(length=5, draw=False)],
+        'Rotation': [Rotation(angle=60)],
+        'Arc': [Arc(angle=60, rx=5, ry=5)],
+        'Arc (elliptic)': [Arc(angle=-200, rx=5, ry=3)],
+        'push/pop': [push, pop],
+    }
+
+
+def generate_all(movements, number):
+    cursor = Cursor(x=0, y=0, dir=0)
+    for _ in range(number):
+        for movement in movements:
+            _, cursor = movement.generate(cursor)
+
+
+def advance_all(movements, number):
+    cursor = Cursor(x=0, y=0, dir=0)
+    for _ in range(number):
+        for movement in movements:
+            movement.advance(cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'movement':<16}{'generate/s':>14}{'advance/s':>14}{'speedup':>9}")
+    for name, movements in movement_cases().items():
+        count = args.number * len(movements)
+        generate_time = min(timeit.repeat(lambda: generate_all(movements, args.number), number=1,
+                                          repeat=args.repeat))
+        advance_time = min(timeit.repeat(lambda: advance_all(movements, args.number), number=1,
+                                         repeat=args.repeat))
+        print(f"{name:<16}{count / generate_time:>14,.0f}{count / advance_time:>14,.0f}"
+              f"{generate_time / advance_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
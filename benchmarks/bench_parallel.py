@@ -0,0 +1,48 @@
+# Scaling of LSystem.run_parallel with the number of worker processes, compared with rewriting one whole generation
+# after the other in this process (RewritePlan.apply on strings) for a context-free and a context-sensitive curve.
+#
+#   $ python -m benchmarks.bench_parallel [--workers 8] [--chunk-size 1048576] [--repeat 3]
+import argparse
+import os
+import timeit
+
+from lsystems import curves
+
+# depth per curve, chosen such that the final generation has tens of millions of symbols
+DEPTHS = {
+    curves.Dragon: 24,
+    curves.Hendragon2: 9,
+}
+
+
+def serial_run(lsys, depth):
+    current_string = lsys.start_symbol
+    for _ in range(depth):
+        current_string = lsys.plan.apply(current_string)
+    return current_string
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=1 << 20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'curve':<12}{'depth':>6}{'length':>12}{'workers':>9}{'symbols/s':>14}{'vs. 1 worker':>14}"
+          f"{'vs. serial':>12}")
+    for curve_class, depth in DEPTHS.items():
+        lsys = curve_class().lsys
+        length = len(lsys.run_parallel(depth, workers=1, chunk_size=args.chunk_size))
+        serial = min(timeit.repeat(lambda: serial_run(lsys, depth), number=1, repeat=args.repeat))
+        single = None
+        for workers in range(1, args.workers + 1):
+            elapsed = min(timeit.repeat(lambda: lsys.run_parallel(depth, workers=workers, chunk_size=args.chunk_size),
+                                        number=1, repeat=args.repeat))
+            single = elapsed if single is None else single
+            print(f"{curve_class.__name__:<12}{depth:>6}{length:>12}{workers:>9}{length / elapsed:>14,.0f}"
+                  f"{single / elapsed:>13.2f}x{serial / elapsed:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# Sweeps every curve in curves.py over a range of depths, straight and curved (for curves with a curved variant), and
+# records time per stage, throughput (symbols/s, segments/s), peak memory and svg size of every render in a json file.
+# with a baseline (an earlier results file) every render that got slower, bigger or needs more memory than the
+# threshold allows is reported, and the exit status is 1.
+#
+#   $ python -m benchmarks.bench_suite [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+#                                      [--repeat 3] [--curves Dragon Hilbert] [--quick]
+#
+# the numbers depend on the machine, so a baseline is recorded locally before a change (benchmarks/baseline.json is
+# ignored by git) and compared against on the same machine after it:
+#
+#   $ python -m benchmarks.bench_suite --output benchmarks/baseline.json
+#   $ python -m benchmarks.bench_suite --baseline benchmarks/baseline.json
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+import numpy as np
+
+from lsystems import curves
+from lsystems.metrics import Metrics
+
+# depths per curve, the deepest one takes a few tenths of a second
+DEPTHS = {
+    curves.Sierpinski: [4, 6, 8],
+    curves.Dragon: [8, 11, 14],
+    curves.Hilbert: [3, 5, 7],
+    curves.FractalPeano: [2, 3, 4],
+    curves.Hendragon: [2, 3, 4],
+    curves.Hendragon2: [2, 3, 5],
+    curves.FractalPlant: [3, 5, 6],
+}
+
+# compared with the baseline, larger is worse for all of them
+TRACKED = ["seconds", "peak_bytes", "output_bytes"]
+
+
+def modes(curve) -> list:
+    # curves without curved pipeline render the same curve in both modes
+    return ["straight", "curved"] if curve.curvedPipeline.stages else ["straight"]
+
+
+def measure(curve_class, depth: int, mode: str, repeat: int) -> dict:
+    curve = curve_class()
+    curved = mode == "curved"
+
+    def render(metrics=None):
+        return curve.run_curved(depth, metrics=metrics) if curved else curve.run(depth, metrics=metrics)
+
+    # cold runs: nothing is served from the expansion cache
+    seconds = min(timeit.repeat(render, setup=curve.lsys.cache.clear, number=1, repeat=repeat))
+    metrics = Metrics()
+    curve.lsys.cache.clear()
+    svg = render(metrics)
+    stages = {record.name: record for record in metrics.stages}
+
+    curve.lsys.cache.clear()
+    tracemalloc.start()
+    render()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    symbols = stages["post-process"].symbols_out
+    segments = stages["turtle"].segments
+    return {
+        "curve": curve_class.__name__,
+        "depth": depth,
+        "mode": mode,
+        "seconds": seconds,
+        "stage_seconds": metrics.seconds(),
+        "symbols": symbols,
+        "segments": segments,
+        "symbols_per_second": symbols / seconds,
+        "segments_per_second": segments / seconds,
+        "peak_bytes": peak_bytes,
+        "output_bytes": len(svg.encode("utf-8")),
+    }
+
+
+# (render, quantity, baseline value, value) of everything that got worse by more than threshold (a fraction)
+def regressions(results: list, baseline: list, threshold: float) -> list:
+    baseline_by_key = {_key(entry): entry for entry in baseline}
+    found = []
+    for entry in results:
+        before = baseline_by_key.get(_key(entry))
+        if before is None:
+            continue
+        for quantity in TRACKED:
+            if entry[quantity] > before[quantity] * (1 + threshold):
+                found.append((_key(entry), quantity, before[quantity], entry[quantity]))
+    return found
+
+
+def _key(entry: dict) -> tuple:
+    return entry["curve"], entry["depth"], entry["mode"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--threshold', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--curves', nargs='*', default=None, help='names of the curves, by default all')
+    parser.add_argument('--quick', action='store_true', help='only the two smallest depths of every curve')
+    args = parser.parse_args()
+
+    curve_classes = [c for c in DEPTHS if args.curves is None or c.__name__ in args.curves]
+    results = []
+    print(f"{'curve':<14}{'depth':>6}{'mode':>10}{'seconds':>10}{'symbols/s':>14}{'segments/s':>14}"
+          f"{'peak MB':>10}{'svg KB':>10}")
+    for curve_class in curve_classes:
+        depths = DEPTHS[curve_class][:2] if args.quick else DEPTHS[curve_class]
+        for depth in depths:
+            for mode in modes(curve_class()):
+                entry = measure(curve_class, depth, mode, args.repeat)
+                results.append(entry)
+                print(f"{entry['curve']:<14}{depth:>6}{mode:>10}{entry['seconds']:>10.4f}"
+                      f"{entry['symbols_per_second']:>14,.0f}{entry['segments_per_second']:>14,.0f}"
+                      f"{entry['peak_bytes'] / 2 ** 20:>10.2f}{entry['output_bytes'] / 2 ** 10:>10.1f}")
+
+    environment = {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                   "processor": platform.processor()}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment, "results": results}, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        found = regressions(results, baseline, args.threshold)
+        for (curve, depth, mode), quantity, before, after in found:
+            print(f"REGRESSION {curve} depth {depth} {mode}: {quantity} {before:.6g} -> {after:.6g} "
+                  f"({after / before - 1:+.0%})")
+        if found:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} compared with {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+from math import cos, sin, radians
+from typing import Optional
+import numpy as np
+
+from .geometry import Geometry, Headings, MovementTable, Tracer, PUSH, POP, ROTATE, LINE, MOVE
+from .lsystem import ExpansionCache, LSystem
+from .svg import PushPosition, PopPosition
+
+
+class _Effect:
+    # what the turtle does for one symbol expanded to some depth, for every possible start heading h:
+    # the turn (in heading steps), the displacement disp[h] and the bounding box bbox[h] = (xmin, ymin, xmax, ymax)
+    # of all positions relative to the start position
+    def __init__(self, turn: int, disp: np.ndarray, bbox: np.ndarray):
+        self.turn = turn
+        self.disp = disp
+        self.bbox = bbox
+
+
+class _Composer:
+    def __init__(self, table: MovementTable, headings: Headings):
+        self.table = table
+        self.headings = headings
+        # sentinels, only compared by identity
+        self.push = _Effect(0, np.empty((0, 2)), np.empty((0, 4)))
+        self.pop = _Effect(0, np.empty((0, 2)), np.empty((0, 4)))
+
+    def atom(self, char: str) -> _Effect:
+        i = self.table.chars.index(char)
+        op = self.table.ops[i]
+        if op == PUSH:
+            return self.push
+        if op == POP:
+            return self.pop
+        unit = self.headings.unit
+        dx, dy = self.table.dx[i], self.table.dy[i]
+        disp = np.stack((dx * unit[:, 0] - dy * unit[:, 1], dx * unit[:, 1] + dy * unit[:, 0]), axis=1)
+        if op == ROTATE:
+            disp = np.zeros_like(disp)
+        bbox = np.concatenate((np.minimum(disp, 0), np.maximum(disp, 0)), axis=1)
+        return _Effect(self.headings.index(self.table.turn[i]), disp, bbox)
+
+    # effect of the given effects one after the other
+    def compose(self, effects) -> _Effect:
+        count = self.headings.count
+        turn = 0
+        disp = np.zeros((count, 2))
+        bbox = np.zeros((count, 4))
+        stack = []
+        for effect in effects:
+            if effect is self.push:
+                stack.append((turn, disp))
+            elif effect is self.pop:
+                if not stack:
+                    raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+                turn, disp = stack.pop()
+            else:
+                shift = (np.arange(count) + turn) % count
+                child_bbox = effect.bbox[shift]
+                bbox[:, :2] = np.minimum(bbox[:, :2], disp + child_bbox[:, :2])
+                bbox[:, 2:] = np.maximum(bbox[:, 2:], disp + child_bbox[:, 2:])
+                disp = disp + effect.disp[shift]
+                turn = (turn + effect.turn) % count
+        if stack:
+            raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+        return _Effect(turn, disp, bbox)
+
+
+def symbol_effects(lsys: LSystem, images: dict, movement_map: dict, headings: Headings, number_of_iterations: int):
+    levels, composer = symbol_effect_levels(lsys, images, movement_map, headings, number_of_iterations)
+    return levels[-1], composer
+
+
+def symbol_effect_levels(lsys: LSystem, images: dict, movement_map: dict, headings: Headings,
+                         number_of_iterations: int):
+    # effect of every symbol expanded 0, 1, ..., number_of_iterations times, level by level:
+    # O(number_of_iterations * |alphabet| * rule length * number of headings)
+    table = _analysable_table(movement_map)
+    composer = _Composer(table, headings)
+    atoms = {char: composer.atom(char) for char in set("".join(images.values()))}
+
+    def image_effect(symbol):
+        image = images[symbol]
+        if len(image) == 1 and atoms[image] in (composer.push, composer.pop):
+            return atoms[image]
+        return composer.compose([atoms[char] for char in image])
+
+    levels = [{symbol: image_effect(symbol) for symbol in images}]
+    for _ in range(number_of_iterations):
+        effects = levels[-1]
+        levels.append({symbol: composer.compose([effects[child] for child in lsys.rules[symbol]])
+                       if symbol in lsys.rules else effect for symbol, effect in effects.items()})
+    return levels, composer
+
+
+# what a custom movement does is only known by running it, so it can not be analysed or composed
+def _analysable_table(movement_map: dict) -> MovementTable:
+    table = MovementTable(movement_map)
+    if not table.vectorized:
+        raise ValueError("the movement map has movements that can only be traced symbol by symbol")
+    return table
+
+
+def headings_for(movement_map: dict, symbols, start_direction) -> Headings:
+    table = _analysable_table(movement_map)
+    for char in symbols:
+        if char not in movement_map:
+            raise Exception(f"{char} not defined in movement map")
+    return Headings([start_direction] + [table.turn[table.chars.index(c)] for c in symbols])
+
+
+# bounding box (xmin, ymin, xmax, ymax) of the turtle path for the given generation, without expanding anything.
+# images maps every symbol of the l-system to the turtle symbols it is drawn with
+def extent(lsys: LSystem, images: dict, movement_map: dict, start_direction, number_of_iterations: int,
+           init_str=None) -> tuple:
+    if not lsys.is_context_free():
+        raise ValueError("the extent can only be predicted for rules whose heads are single symbols")
+    headings = headings_for(movement_map, set("".join(images.values())), start_direction)
+    effects, composer = symbol_effects(lsys, images, movement_map, headings, number_of_iterations)
+    total = composer.compose([effects[symbol] for symbol in (init_str if init_str else lsys.start_symbol)])
+    return tuple(total.bbox[headings.index(start_direction) % headings.count].tolist())
+
+
+class _Template:
+    # geometry of one symbol expanded to some depth, drawn from the origin in direction 0 (the start vertex is left
+    # out), together with the rigid transform it applies to the turtle: displacement disp and rotation turn
+    def __init__(self, vertices: np.ndarray, commands: np.ndarray, arcs: np.ndarray, disp: np.ndarray, turn: float):
+        self.vertices = vertices
+        self.commands = commands
+        self.arcs = arcs
+        self.disp = disp
+        self.turn = turn
+
+    def __sizeof__(self):
+        return self.vertices.nbytes + self.commands.nbytes + self.arcs.nbytes + 64
+
+
+# templates of expanded symbols shared by all curves, keyed by (rules, turtle, symbol, depth)
+template_cache = ExpansionCache()
+
+_PUSH = _Template(np.empty((0, 2)), np.empty(0, dtype=np.uint8), np.empty((0, 5)), np.zeros(2), 0.0)
+_POP = _Template(np.empty((0, 2)), np.empty(0, dtype=np.uint8), np.empty((0, 5)), np.zeros(2), 0.0)
+
+
+class _TemplateComposer:
+    def __init__(self, lsys: LSystem, images: dict, movement_map: dict, cache: ExpansionCache):
+        self.lsys = lsys
+        self.images = images
+        self.movement_map = movement_map
+        self.cache = cache
+        table = _analysable_table(movement_map)
+        self.key = (lsys._rules_key, tuple(sorted(images.items())), tuple(table.chars), table.ops.tobytes(),
+                    table.dx.tobytes(), table.dy.tobytes(), table.turn.tobytes(), table.arc.tobytes())
+
+    def template(self, symbol: str, depth: int) -> _Template:
+        return self.lsys.expand_levels(symbol, depth, self.cache, self.key, self._leaf_template,
+                                       lambda tail, level: self.compose([level[c] for c in tail]))
+
+    def _leaf_template(self, symbol: str) -> _Template:
+        key = (self.key, symbol, 0)
+        template = self.cache.get(key)
+        if template is None:
+            template = self._image_template(self.images[symbol])
+            self.cache.put(key, template)
+        return template
+
+    def _image_template(self, image: str) -> _Template:
+        if len(image) == 1 and isinstance(self.movement_map[image], (PushPosition, PopPosition)):
+            return _PUSH if isinstance(self.movement_map[image], PushPosition) else _POP
+        tracer = Tracer(self.movement_map)
+        geometry = tracer.trace(image)
+        if tracer.stack:
+            raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+        return _Template(geometry.vertices[1:], geometry.commands, geometry.arcs,
+                         np.array([tracer.cursor.x, tracer.cursor.y]), tracer.cursor.dir)
+
+    # the templates one after the other: each one is rotated and moved to where the previous one ended
+    def compose(self, templates, start=(0.0, 0.0), start_direction=0.0) -> _Template:
+        position = np.array(start, dtype=float)
+        direction = start_direction
+        stack = []
+        vertices, commands, arcs = [], [], []
+        for template in templates:
+            if template is _PUSH:
+                stack.append((position, direction))
+            elif template is _POP:
+                if not stack:
+                    raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+                position, direction = stack.pop()
+                vertices.append(position[None, :])
+                commands.append(np.array([MOVE], dtype=np.uint8))
+            else:
+                rad = radians(direction)
+                rotation = np.array([[cos(rad), sin(rad)], [-sin(rad), cos(rad)]])
+                vertices.append(template.vertices @ rotation + position)
+                commands.append(template.commands)
+                placed_arcs = template.arcs.copy()
+                placed_arcs[:, 2] += direction
+                arcs.append(placed_arcs)
+                position = template.disp @ rotation + position
+                direction = direction + template.turn
+        if stack:
+            raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+        return _Template(np.concatenate([np.empty((0, 2))] + vertices),
+                         np.concatenate([np.empty(0, dtype=np.uint8)] + commands),
+                         np.concatenate([np.empty((0, 5))] + arcs), position, direction - start_direction)
+
+
+# geometry of the given generation, placed together from the cached geometry of expanded symbols instead of
+# interpreting the whole sequence
+def composed_geometry(lsys: LSystem, images: dict, movement_map: dict, start_direction, number_of_iterations: int,
+                      init_str=None, cache: Optional[ExpansionCache] = None) -> Geometry:
+    if not lsys.is_context_free():
+        raise ValueError("geometry can only be composed for rules whose heads are single symbols")
+    composer = _TemplateComposer(lsys, images, movement_map, template_cache if cache is None else cache)
+    symbols = init_str if init_str else lsys.start_symbol
+    total = composer.compose([composer.template(c, number_of_iterations) for c in symbols],
+                             start_direction=start_direction)
+    vertices = np.concatenate((np.zeros((1, 2)), total.vertices))
+    xmin, ymin = vertices.min(axis=0).tolist()
+    xmax, ymax = vertices.max(axis=0).tolist()
+    return Geometry(vertices, total.commands, total.arcs, (xmin, ymin, xmax, ymax))
+
+
+# geometry of the given generation drawn at a resolution of about resolution pixels along its longer side: a sub-curve
+# whose extent is smaller than threshold pixels is not expanded any further but replaced by its chord, so the number
+# of segments depends on the resolution instead of the number of iterations
+def lod_geometry(lsys: LSystem, images: dict, movement_map: dict, start_direction, number_of_iterations: int,
+                 resolution, threshold=1.0, init_str=None) -> Geometry:
+    if not lsys.is_context_free():
+        raise ValueError("the level of detail can only be chosen for rules whose heads are single symbols")
+    symbols = init_str if init_str else lsys.start_symbol
+    headings = headings_for(movement_map, set("".join(images.values())), start_direction)
+    levels, composer = symbol_effect_levels(lsys, images, movement_map, headings, number_of_iterations)
+    start_heading = headings.index(start_direction) % headings.count
+    xmin, ymin, xmax, ymax = composer.compose([levels[-1][symbol] for symbol in symbols]).bbox[start_heading]
+    # smallest extent (in the units of the geometry) that is still expanded
+    min_extent = threshold * max(xmax - xmin, ymax - ymin) / resolution
+    templates = _TemplateComposer(lsys, images, movement_map, template_cache)
+    # the result for a symbol only depends on its depth and the heading it starts in
+    drawn: dict = {}
+
+    def chord(effect, heading) -> _Template:
+        end = effect.disp[heading]
+        # nothing to draw if the sub-curve ends where it started
+        vertices = end[None, :] if np.any(end != 0) else np.empty((0, 2))
+        return _Template(vertices, np.full(len(vertices), LINE, dtype=np.uint8), np.empty((0, 5)), end,
+                         effect.turn * headings.step)
+
+    # the template of the symbol drawn to depth starting in heading, None if it has to be joined from its children
+    def draw_directly(symbol, depth, heading):
+        key = (symbol, depth, heading)
+        if key in drawn:
+            return drawn[key]
+        effect = levels[depth][symbol]
+        if effect is composer.push or effect is composer.pop:
+            return _PUSH if effect is composer.push else _POP
+        bbox = effect.bbox[heading]
+        if max(bbox[2] - bbox[0], bbox[3] - bbox[1]) < min_extent:
+            template = chord(effect, heading)
+        elif depth == 0 or symbol not in lsys.rules:
+            template = templates.compose([templates.template(symbol, 0)], start_direction=heading * headings.step)
+        else:
+            return None
+        drawn[key] = template
+        return template
+
+    # the symbols one after the other, each one drawn to the given depth. the sub-curves being joined are kept on an
+    # explicit stack (instead of recursing), so the depth is not bounded by the recursion limit
+    def join(symbols, depth, heading) -> _Template:
+        frames = [(None, _Join(symbols, depth, heading, headings))]
+        while True:
+            key, joined = frames[-1]
+            child = joined.next_child()
+            if child is None:
+                template = joined.template()
+                frames.pop()
+                if key is None:
+                    return template
+                drawn[key] = template
+                frames[-1][1].add(template)
+                continue
+            template = draw_directly(*child)
+            if template is None:
+                symbol, child_depth, child_heading = child
+                frames.append((child, _Join(lsys.rules[symbol], child_depth - 1, child_heading, headings)))
+            else:
+                joined.add(template)
+
+    total = join(symbols, number_of_iterations, start_heading)
+    vertices = np.concatenate((np.zeros((1, 2)), total.vertices))
+    xmin, ymin = vertices.min(axis=0).tolist()
+    xmax, ymax = vertices.max(axis=0).tolist()
+    return Geometry(vertices, total.commands, total.arcs, (xmin, ymin, xmax, ymax))
+
+
+class _Join:
+    # templates of children drawn to depth, placed one after the other starting in heading (see lod_geometry)
+    def __init__(self, children, depth: int, heading: int, headings: Headings):
+        self.children = children
+        self.depth = depth
+        self.heading = heading
+        self.headings = headings
+        self.index = 0
+        self.position = np.zeros(2)
+        self.turn = 0
+        self.stack: list = []
+        self.vertices: list = []
+        self.commands: list = []
+        self.arcs: list = []
+
+    # (symbol, depth, heading) of the next child to draw, None once all of them are added
+    def next_child(self):
+        if self.index == len(self.children):
+            return None
+        return (self.children[self.index], self.depth,
+                (self.heading + self.turn // self.headings.step) % self.headings.count)
+
+    def add(self, template: _Template):
+        self.index += 1
+        if template is _PUSH:
+            self.stack.append((self.position, self.turn))
+        elif template is _POP:
+            if not self.stack:
+                raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+            self.position, self.turn = self.stack.pop()
+            self.vertices.append(self.position[None, :])
+            self.commands.append(np.array([MOVE], dtype=np.uint8))
+        else:
+            self.vertices.append(template.vertices + self.position)
+            self.commands.append(template.commands)
+            self.arcs.append(template.arcs)
+            self.position = self.position + template.disp
+            self.turn = self.turn + int(round(template.turn))
+
+    def template(self) -> _Template:
+        if self.stack:
+            raise ValueError("unbalanced PushPosition/PopPosition in a single expansion")
+        return _Template(np.concatenate([np.empty((0, 2))] + self.vertices),
+                         np.concatenate([np.empty(0, dtype=np.uint8)] + self.commands),
+                         np.concatenate([np.empty((0, 5))] + self.arcs), self.position, self.turn)
@@ -0,0 +1,205 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+from typing import Optional
+import numpy as np
+from PIL import Image
+
+from .curves import Curve
+from .geometry import Geometry
+from .lsystem import LSystem, RewritePipeline
+from .svg import Movement
+from .turtle import SVGTurtle
+
+# part of every key, changing it invalidates everything cached before (e.g. when the format of an entry changes)
+CACHE_VERSION = 1
+
+
+class RenderCache:
+    # results of rendering curves (sequences, geometry, svgs and images) on disk in directory, content-addressed: the
+    # key is a hash of everything the result depends on (see key). entries are written atomically, so several
+    # processes can share a directory. the least recently used entries are removed once the cache takes more than
+    # max_bytes. hits and misses count the lookups of this instance
+    def __init__(self, directory: str, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # size of all entries as of the last scan of the directory plus what this instance wrote since, so only a put
+        # that passes max_bytes scans the directory (None until the first put)
+        self._size: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # hash of the given parts (curves, turtles, l-systems, movements and plain values), see describe
+    @staticmethod
+    def key(*parts) -> str:
+        description = json.dumps([CACHE_VERSION] + [describe(part) for part in parts], sort_keys=True)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, kind: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{kind}")
+
+    def get(self, key: str, kind: str):
+        try:
+            with open(self.path(key, kind), "rb") as f:
+                data = f.read()
+            # the modification time orders the entries for the eviction
+            os.utime(self.path(key, kind))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _CODECS[kind][1](data)
+
+    def put(self, key: str, kind: str, value):
+        path = self.path(key, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written next to the entry and renamed, nobody ever reads a partly written entry
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                data = _CODECS[kind][0](value)
+                f.write(data)
+            replaced = _file_size(path)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        if self._size is None:
+            self._size = sum(entry[1] for entry in self._entries())
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    # the cached value, computed with compute() and cached if there is none
+    def fetch(self, key: str, kind: str, compute):
+        value = self.get(key, kind)
+        if value is None:
+            value = compute()
+            self.put(key, kind, value)
+        return value
+
+    # removes the least recently used entries until the cache takes at most max_bytes
+    def evict(self):
+        entries = self._entries()
+        size = sum(entry[1] for entry in entries)
+        for path, entry_size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {"hits": self.hits, "misses": self.misses, "entries": len(entries),
+                "bytes": sum(entry[1] for entry in entries)}
+
+    # (path, size, modification time) of every entry, entries removed by other processes meanwhile are left out
+    def _entries(self) -> list:
+        entries = []
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+
+# json-compatible description of everything that determines what a curve renders
+def describe(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [describe(v) for v in value]
+    if isinstance(value, dict):
+        return [[describe(k), describe(v)] for k, v in sorted(value.items(), key=lambda item: repr(item[0]))]
+    if isinstance(value, np.ndarray):
+        return describe(value.tolist())
+    if isinstance(value, Movement):
+        # the public slots and attributes (of subclasses without slots), the stack of push and pop is only state
+        names = [slot for cls in type(value).__mro__ for slot in getattr(cls, "__slots__", ())]
+        names += sorted(getattr(value, "__dict__", {}))
+        return [type(value).__name__] + [[name, describe(getattr(value, name))] for name in names
+                                         if not name.startswith("_") and name != "stack"]
+    if isinstance(value, Curve):
+        return [type(value).__name__, describe(value.lsys), describe(value.strPipeline),
+                describe(value.curvedPipeline), describe(value.postProcessMap), describe(value.turtle)]
+    if isinstance(value, LSystem):
+        return ["LSystem", describe(value.rules), value.start_symbol]
+    if isinstance(value, RewritePipeline):
+        return ["RewritePipeline", describe(list(value.stages))]
+    if isinstance(value, SVGTurtle):
+        return [type(value).__name__, describe(value.movement_map), value.width, value.height, value.stroke,
+                value.start_direction, value.simplify_tolerance]
+    raise TypeError(f"can not describe {type(value).__name__} for a cache key")
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _dump_array(codes: np.ndarray) -> bytes:
+    f = io.BytesIO()
+    np.save(f, codes, allow_pickle=False)
+    return f.getvalue()
+
+
+def _load_array(data: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+def _dump_geometry(geometry: Geometry) -> bytes:
+    f = io.BytesIO()
+    np.savez(f, vertices=geometry.vertices, commands=geometry.commands, arcs=geometry.arcs,
+             bbox=np.array(geometry.bbox, dtype=np.float64))
+    return f.getvalue()
+
+
+def _load_geometry(data: bytes) -> Geometry:
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        return Geometry(arrays["vertices"], arrays["commands"], arrays["arcs"], tuple(arrays["bbox"].tolist()))
+
+
+def _dump_image(image: Image.Image) -> bytes:
+    f = io.BytesIO()
+    image.save(f, format="PNG")
+    return f.getvalue()
+
+
+def _load_image(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+# (dump, load) for every kind of entry, the kind is also the file extension
+_CODECS: dict = {
+    "sequence": (_dump_array, _load_array),
+    "geometry": (_dump_geometry, _load_geometry),
+    "svg": (lambda svg: svg.encode("utf-8"), lambda data: data.decode("utf-8")),
+    "png": (_dump_image, _load_image),
+}
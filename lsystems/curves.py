@@ -1,17 +1,32 @@
-import re
-from abc import ABC, abstractmethod
+from abc import ABC
+from collections import Counter
+from functools import cached_property
+from itertools import chain
+from typing import Iterable, Iterator
 import numpy as np
 
-from .lsystem import LSystem
+from . import analysis, explore, tiles
+from .geometry import Geometry
+from .encoding import Alphabet, Substitution
+from .lsystem import LSystem, RewritePipeline
+from .metrics import stage, size_of
+from .svg import Rotation, PushPosition
 from .turtle import SimpleTurtle
 
 
 class Curve(ABC):
 
     lsys: LSystem
+    # the constructors of all curves pass simplify_tolerance on to the turtle, see SVGTurtle
     turtle: SimpleTurtle
     filename: str
     postProcessMap: any
+    # rewriting stages applied to the l-system string in run_str
+    strPipeline: RewritePipeline = RewritePipeline()
+    # rewriting stages turning the output of run_str into the curved string
+    curvedPipeline: RewritePipeline = RewritePipeline()
+    # whether run_str rewrites every symbol of the l-system on its own
+    _symbolwise = True
 
     def get_variables(self) -> set:
         return self.lsys.get_variables()
@@ -19,12 +34,239 @@ class Curve(ABC):
     def get_constants(self) -> set:
         return self.lsys.get_constants()
 
-    def run(self, iters: int, init_str: str = "", writeOutput=False) -> str:
-        sequence = self.run_str(iters, init_str)
-        if self.postProcessMap is not None:
-            sequence = _post_process(sequence, self.postProcessMap)
+    @cached_property
+    def _output_pipeline(self) -> RewritePipeline:
+        return _with_post_process(RewritePipeline(), self.postProcessMap)
+
+    @cached_property
+    def _curved_output_pipeline(self) -> RewritePipeline:
+        return _with_post_process(self.curvedPipeline, self.postProcessMap)
+
+    # maps every symbol of the l-system on its own to the turtle symbols of the straight (or curved) curve, None if
+    # run_str (or run_curved_str) is more than a symbol-wise rewriting
+    def _symbol_pipeline(self, curved=False):
+        if not self._symbolwise:
+            return None
+        pipeline = self.strPipeline.then(*self.curvedPipeline.stages) if curved else self.strPipeline
+        pipeline = _with_post_process(pipeline, self.postProcessMap)
+        return pipeline if pipeline.is_context_free() else None
+
+    def _symbol_images(self, init_str: str = "", curved=False) -> dict:
+        pipeline = self._symbol_pipeline(curved=curved)
+        if pipeline is None or not self.lsys.is_context_free():
+            raise ValueError(f"{type(self).__name__} can not be analysed symbol by symbol")
+        alphabet = self.get_variables() | self.get_constants() | set(init_str or self.lsys.start_symbol)
+        return {symbol: pipeline.apply(symbol) for symbol in alphabet}
+
+    # number of every turtle symbol of the straight curve, without expanding anything
+    def symbol_counts(self, iters: int, init_str: str = "") -> dict:
+        images = self._symbol_images(init_str)
+        counts: Counter = Counter()
+        for symbol, count in self.lsys.symbol_counts(iters, init_str=init_str).items():
+            for char, char_count in Counter(images[symbol]).items():
+                counts[char] += count * char_count
+        return dict(counts)
+
+    def sequence_length(self, iters: int, init_str: str = "") -> int:
+        return sum(self.symbol_counts(iters, init_str=init_str).values())
+
+    # number of lines, moves and arcs of the straight curve (i.e. the length of its geometry)
+    def segment_count(self, iters: int, init_str: str = "") -> int:
+        movement_map = self.turtle.movement_map
+        return sum(count for char, count in self.symbol_counts(iters, init_str=init_str).items()
+                   if char in movement_map and not isinstance(movement_map[char], (Rotation, PushPosition)))
+
+    # bounding box (xmin, ymin, xmax, ymax) of the straight curve, without expanding anything
+    def extent(self, iters: int, init_str: str = "") -> tuple:
+        return analysis.extent(self.lsys, self._symbol_images(init_str), self.turtle.movement_map,
+                               self.turtle.start_direction, iters, init_str=init_str)
+
+    # the symbols handed to the turtle. lazy=True streams them instead of building the (exponentially long) string,
+    # they are then expanded and post-processed within the stage that consumes them (see metrics.py). the turtle
+    # traces them chunk by chunk (see SVGTurtle.geometry), so only the geometry takes memory proportional to the curve
+    def _sequence(self, iters: int, init_str: str, curved: bool, lazy: bool, metrics=None):
+        pipeline = self._curved_output_pipeline if curved else self._output_pipeline
+        if lazy:
+            return pipeline.iter_apply(self.iter_str(iters, init_str=init_str))
+        with stage(metrics, "expand", symbols_in=len(init_str or self.lsys.start_symbol)) as record:
+            lsys_string = self.lsys.run(iters, init_str=init_str)
+            record.symbols_out = len(lsys_string)
+            record.output_bytes = size_of(lsys_string)
+        with stage(metrics, "post-process", symbols_in=len(lsys_string)) as record:
+            sequence = pipeline.apply(self._str_of(lsys_string))
+            record.symbols_out = len(sequence)
+            record.output_bytes = size_of(sequence)
+        return sequence
+
+    # resolution (in pixels) turns on the level of detail mode, see run_geometry
+    # cache (a RenderCache, see cache.py) keeps the svg, geometry and sequence on disk for the next run
+    # metrics (a Metrics, see metrics.py) collects the time and sizes of every stage of the run
+    def run(self, iters: int, init_str: str = "", writeOutput=False, lazy=False, resolution=None, cache=None,
+            metrics=None) -> str:
+        return self._run_svg(iters, init_str, False, writeOutput, lazy, resolution, cache, metrics)
+
+    def _run_svg(self, iters: int, init_str: str, curved: bool, writeOutput: bool, lazy: bool, resolution, cache,
+                 metrics) -> str:
         filename = None if not writeOutput else self.filename
-        return self.turtle.asSvgString(sequence, writeToFilename=filename)
+        if cache is not None:
+            svg = self._cached(cache, "svg", lambda: self._serialize(self.run_geometry(
+                iters, init_str=init_str, curved=curved, lazy=lazy, resolution=resolution, cache=cache,
+                metrics=metrics), metrics), iters, init_str, curved, resolution=resolution)
+            if filename is not None:
+                self.turtle.saveSvgString(svg, filename)
+            return svg
+        geometry = self.run_geometry(iters, init_str=init_str, curved=curved, lazy=lazy, resolution=resolution,
+                                     metrics=metrics)
+        return self._serialize(geometry, metrics, filename=filename)
+
+    def _serialize(self, geometry: Geometry, metrics, filename=None) -> str:
+        with stage(metrics, "serialize") as record:
+            svg = self.turtle.geometryAsSvgString(geometry, writeToFilename=filename)
+            record.segments = len(geometry)
+            record.output_bytes = size_of(svg)
+        return svg
+
+    # what compute() returns, looked up in (and added to) cache under the curve and the arguments of the run
+    def _cached(self, cache, kind: str, compute, iters: int, init_str: str, curved: bool, **options):
+        if cache is None:
+            return compute()
+        key = cache.key(self, kind, iters, init_str if init_str else self.lsys.start_symbol, curved, options)
+        return cache.fetch(key, kind, compute)
+
+    # writes the svg with the fast path writer (see SVGTurtle.writeSvg), by default to self.filename
+    def write_svg(self, iters: int, out=None, init_str: str = "", curved=False, lazy=False, precision=4,
+                  relative=False, metrics=None) -> int:
+        geometry = self.run_geometry(iters, init_str=init_str, curved=curved, lazy=lazy, metrics=metrics)
+        out = self.filename if out is None else out
+        with stage(metrics, "serialize") as record:
+            characters = self.turtle.writeGeometrySvg(geometry, out, precision=precision, relative=relative)
+            record.segments = len(geometry)
+            record.output_bytes = characters
+        return characters
+
+    # renders curves whose svg does not fit into memory: the symbols are expanded lazily while writing the svg to out
+    # (by default self.filename). the bounding box is predicted if possible, otherwise the symbols are expanded
+    # once more for it before
+    # store (a GenerationStore of self.lsys, see LSystem.run_to_disk) reads the generation from disk instead
+    def stream_svg(self, iters: int, out=None, init_str: str = "", curved=False, bbox=None, precision=4,
+                   relative=False, store=None, metrics=None) -> int:
+        out = self.filename if out is None else out
+        if store is not None:
+            init_str = store.initial_string
+        if bbox is None and not curved:
+            try:
+                bbox = self.extent(iters, init_str=init_str)
+            except ValueError:
+                pass
+
+        def symbols():
+            if store is not None:
+                return self.iter_stored(store, iters, curved=curved)
+            return self._sequence(iters, init_str, curved=curved, lazy=True)
+
+        # expansion, post-processing, tracing and writing are interleaved in a single stage
+        with stage(metrics, "stream") as record:
+            characters = self.turtle.streamSvg(symbols, out, bbox=bbox, precision=precision, relative=relative)
+            record.output_bytes = characters
+        return characters
+
+    # lines, moves and arcs as arrays instead of an svg string
+    # composed=True places the cached geometry of expanded symbols instead of tracing the whole sequence, which
+    # requires a symbol-wise rewriting (see _symbol_images)
+    # with a resolution, sub-curves smaller than lod_threshold pixels (when the whole curve is resolution pixels wide)
+    # are drawn as their chord instead of being expanded, which also requires a symbol-wise rewriting.
+    # encoded=True traces the one-byte codes of run_encoded instead of a string, which is also what happens with a
+    # cache (see run)
+    def run_geometry(self, iters: int, init_str: str = "", curved=False, lazy=False, composed=False, resolution=None,
+                     lod_threshold=1.0, encoded=False, cache=None, metrics=None) -> Geometry:
+        if cache is not None:
+            options = {} if resolution is None else {"resolution": resolution, "lod_threshold": lod_threshold}
+
+            def compute():
+                if resolution is None and not composed:
+                    return self._trace(self.run_encoded(iters, init_str=init_str, curved=curved, cache=cache,
+                                                        metrics=metrics), metrics)
+                return self.run_geometry(iters, init_str=init_str, curved=curved, composed=composed,
+                                         resolution=resolution, lod_threshold=lod_threshold, metrics=metrics)
+
+            return self._cached(cache, "geometry", compute, iters, init_str, curved, **options)
+        if resolution is not None or composed:
+            # the geometry is put together from the geometry of expanded symbols, nothing is expanded on its own
+            with stage(metrics, "compose") as record:
+                if resolution is not None:
+                    geometry = analysis.lod_geometry(self.lsys, self._symbol_images(init_str, curved=curved),
+                                                     self.turtle.movement_map, self.turtle.start_direction, iters,
+                                                     resolution, threshold=lod_threshold, init_str=init_str)
+                else:
+                    geometry = analysis.composed_geometry(self.lsys, self._symbol_images(init_str, curved=curved),
+                                                          self.turtle.movement_map, self.turtle.start_direction,
+                                                          iters, init_str=init_str)
+                # the same simplification the turtle applies to what it traces
+                geometry = self.turtle._simplify(geometry)
+                record.segments = len(geometry)
+                record.output_bytes = _geometry_bytes(geometry)
+            return geometry
+        if encoded:
+            return self._trace(self.run_encoded(iters, init_str=init_str, curved=curved, metrics=metrics), metrics)
+        return self._trace(self._sequence(iters, init_str, curved=curved, lazy=lazy, metrics=metrics), metrics)
+
+    def _trace(self, sequence, metrics) -> Geometry:
+        with stage(metrics, "turtle", symbols_in=len(sequence) if hasattr(sequence, "__len__") else None) as record:
+            geometry = self.turtle.geometry(sequence)
+            record.segments = len(geometry)
+            record.output_bytes = _geometry_bytes(geometry)
+        return geometry
+
+    # writes the curve as a pyramid of tiles into directory, see tiles.export_tiles for the options
+    def export_tiles(self, iters: int, directory: str, init_str: str = "", curved=False, **options) -> dict:
+        geometry = self.run_geometry(iters, init_str=init_str, curved=curved, encoded=True)
+        return tiles.export_tiles(self.turtle, geometry, directory, **options)
+
+    # the turtle symbols as uint8 codes of the movement map (see SVGTurtle.encode). for a symbol-wise rewriting the
+    # l-system runs on codes and the codes are post-processed with table lookups, without building any strings
+    def run_encoded(self, iters: int, init_str: str = "", curved=False, cache=None, metrics=None) -> np.ndarray:
+        if cache is not None:
+            return self._cached(cache, "sequence", lambda: self.run_encoded(iters, init_str=init_str, curved=curved,
+                                                                            metrics=metrics),
+                                iters, init_str, curved)
+        pipeline = self._symbol_pipeline(curved=curved)
+        if pipeline is None or not self.lsys.is_context_free():
+            sequence = self._sequence(iters, init_str, curved=curved, lazy=False, metrics=metrics)
+            with stage(metrics, "encode", symbols_in=len(sequence)) as record:
+                codes = self.turtle.encode(sequence)
+                record.symbols_out = len(codes)
+                record.output_bytes = size_of(codes)
+            return codes
+        with stage(metrics, "expand", symbols_in=len(init_str or self.lsys.start_symbol)) as record:
+            lsys_codes = self.lsys.run_encoded(iters, init_str=init_str)
+            record.symbols_out = len(lsys_codes)
+            record.output_bytes = size_of(lsys_codes)
+        with stage(metrics, "post-process", symbols_in=len(lsys_codes)) as record:
+            codes = self._turtle_substitution(pipeline, self.lsys.alphabet_for(init_str)).apply(lsys_codes)
+            record.symbols_out = len(codes)
+            record.output_bytes = size_of(codes)
+        return codes
+
+    # maps codes of the l-system (of the given alphabet, see LSystem.alphabet_for) on codes of the movement map
+    def _turtle_substitution(self, pipeline: RewritePipeline, alphabet: Alphabet) -> Substitution:
+        return Substitution([self.turtle.encode(pipeline.apply(symbol)) for symbol in alphabet.symbols])
+
+    # the curve drawn into a grayscale PIL image, see SVGTurtle.asImage
+    def run_image(self, iters: int, init_str: str = "", curved=False, lazy=False, size=None, antialias=4, cache=None,
+                  metrics=None):
+        return self._cached(cache, "png", lambda: self._rasterize(
+            self.run_geometry(iters, init_str=init_str, curved=curved, lazy=lazy, cache=cache, metrics=metrics),
+            size, antialias, metrics), iters, init_str, curved, size=self._image_size(size), antialias=antialias)
+
+    def _rasterize(self, geometry: Geometry, size, antialias, metrics):
+        with stage(metrics, "raster") as record:
+            image = self.turtle.geometryAsImage(geometry, size=size, antialias=antialias)
+            record.segments = len(geometry)
+            record.output_bytes = image.width * image.height
+        return image
+
+    def _image_size(self, size) -> tuple:
+        return (self.turtle.width, self.turtle.height) if size is None else tuple(size)
 
     def run_str(self, iters: int, init_str: str = "") -> str:
         if init_str == "":
@@ -32,92 +274,121 @@ class Curve(ABC):
         else:
             sequence = self.lsys.run_from(init_str, iters)
 
-        return sequence
+        return self._str_of(sequence)
+
+    # the output of run_str for a string of the l-system
+    def _str_of(self, lsys_string: str) -> str:
+        return self.strPipeline.apply(lsys_string)
+
+    def iter_str(self, iters: int, init_str: str = "") -> Iterator[str]:
+        return self._iter_str_of(self.lsys.iter_symbols(iters, init_str=init_str))
+
+    # lazy _str_of
+    def _iter_str_of(self, lsys_symbols: Iterable[str]) -> Iterator[str]:
+        return self.strPipeline.iter_apply(lsys_symbols)
+
+    # the turtle symbols of a generation kept on disk by a GenerationStore of self.lsys (see LSystem.run_to_disk):
+    # chunks of codes of the movement map for a symbol-wise rewriting, single symbols otherwise
+    def iter_stored(self, store, iters: int, curved=False) -> Iterable:
+        pipeline = self._symbol_pipeline(curved=curved)
+        if pipeline is not None and self.lsys.is_context_free():
+            substitution = self._turtle_substitution(pipeline, store.alphabet)
+            return (substitution.apply(chunk) for chunk in store.iter_chunks(iters))
+        output_pipeline = self._curved_output_pipeline if curved else self._output_pipeline
+        return output_pipeline.iter_apply(self._iter_str_of(chain.from_iterable(store.iter_strings(iters))))
 
-    @abstractmethod
     def run_curved_str(self, iters: int, init_str: str = "") -> str:
-        return ''
+        return self.curvedPipeline.apply(self.run_str(iters, init_str=init_str))
+
+    def iter_curved_str(self, iters: int, init_str: str = "") -> Iterator[str]:
+        return self.curvedPipeline.iter_apply(self.iter_str(iters, init_str=init_str))
+
+    # yields generations 0 to max_iters, every one expanded once from the previous one. the turtle symbols, geometry
+    # and svg of a generation are only computed when they are asked for (or looked up in cache, see run)
+    def run_generations(self, max_iters: int, init_str: str = "", curved=False, cache=None,
+                        metrics=None) -> Iterator['Generation']:
+        generations = self.lsys.iter_generations(max_iters, init_str=init_str)
+        for iters in range(max_iters + 1):
+            with stage(metrics, "expand") as record:
+                lsys_string = next(generations)
+                record.symbols_out = len(lsys_string)
+                record.output_bytes = size_of(lsys_string)
+            yield Generation(self, iters, lsys_string, curved, init_str=init_str, cache=cache, metrics=metrics)
 
     # returns an svg string
-    def run_curved(self, iters: int, writeOutput=False, init_str="") -> str:
-        sequence = self.run_curved_str(iters, init_str=init_str)
-        if self.postProcessMap is not None:
-            sequence = _post_process(sequence, self.postProcessMap)
-        filename = None if not writeOutput else self.filename
-        return self.turtle.asSvgString(sequence, writeToFilename=filename)
+    def run_curved(self, iters: int, writeOutput=False, init_str="", lazy=False, resolution=None, cache=None,
+                   metrics=None) -> str:
+        return self._run_svg(iters, init_str, True, writeOutput, lazy, resolution, cache, metrics)
 
 
 class Sierpinski(Curve):
 
-    def __init__(self, size=1000, width=3, filename='sierpinski_curve.svg'):
+    curvedPipeline = RewritePipeline(
+        {'A': 'F', 'B': 'F'},
+        {'F': 'XX'},
+        {'X+X': ')', 'X-X': '('})
+
+    def __init__(self, size=1000, width=3, filename='sierpinski_curve.svg', simplify_tolerance=None):
         self.filename = filename
         self.lsys = LSystem(
             'A -> B - A - B; B -> A + B + A;', start_symbol='A')  # sierpinski-curve
         self.postProcessMap = {'A': 'F', 'B': 'F', 'X': 'F'}
-        self.turtle = SimpleTurtle(60, 50, size, width=width)
-
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        raw_str = self.run_str(iters, init_str=init_str)
-        f_string = _post_process(raw_str, {'A': 'F', 'B': 'F'})
-        split_string = _post_process(f_string, {'F': 'XX'})
-        return _post_process(split_string, {'X+X': ')', 'X-X': '('})
+        self.turtle = SimpleTurtle(60, 50, size, width=width, simplify_tolerance=simplify_tolerance)
 
 
 class Dragon(Curve):
 
-    def __init__(self, size=1000, width=3, filename='dragon_curve.svg'):
+    curvedPipeline = RewritePipeline(
+        {'G': 'F'},
+        {'F': 'XX'},
+        {'X+X': ')', 'X-X': '('})
+
+    def __init__(self, size=1000, width=3, filename='dragon_curve.svg', simplify_tolerance=None):
         self.filename = filename
         self.lsys = LSystem('F -> F + G; G -> F - G;', start_symbol='F')  # dragon-curve
         self.postProcessMap = {'F': 'F', 'G': 'F', 'X': 'F'}
-        self.turtle = SimpleTurtle(90, 50, size, width=width)
-
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        raw_str = self.run_str(iters, init_str=init_str)
-        f_string = _post_process(raw_str, {'G': 'F'})
-        split_string = _post_process(f_string, {'F': 'XX'})
-        return _post_process(split_string, {'X+X': ')', 'X-X': '('})
+        self.turtle = SimpleTurtle(90, 50, size, width=width, simplify_tolerance=simplify_tolerance)
 
 
 class Hilbert(Curve):
 
-    def __init__(self, size=1000, width=3, filename='hilbert_curve.svg'):
+    curvedPipeline = RewritePipeline(
+        {'A': '', 'B': '', '+-': '', '-+': ''},
+        {'F': 'XX'},
+        {'X+X': ')', 'X-X': '('},
+        {'X': 'F'})
+
+    def __init__(self, size=1000, width=3, filename='hilbert_curve.svg', simplify_tolerance=None):
         self.filename = filename
         self.lsys = LSystem('A -> +BF-AFA-FB+; B -> -AF+BFB+FA-;', start_symbol='A')  # hilbert-curve
         self.postProcessMap = {'A': '', 'B': ''}
-        self.turtle = SimpleTurtle(90, 10, size, width=width)
-
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        raw_str = self.run_str(iters, init_str=init_str)
-        f_string = _post_process(raw_str, {'A': '', 'B': '', '+-': '', '-+': ''})
-        split_string = _post_process(f_string, {'F': 'XX'})
-        curved_string = _post_process(split_string, {'X+X': ')', 'X-X': '('})
-        return _post_process(curved_string, {'X': 'F'})
+        self.turtle = SimpleTurtle(90, 10, size, width=width, simplify_tolerance=simplify_tolerance)
 
 
 # Peano-curve with middle removed
 class FractalPeano(Curve):
 
-    def __init__(self, size=1000, width=3, filename='fractal_peano_curve.svg'):
+    curvedPipeline = RewritePipeline(
+        {'A': '', 'B': '', 'C': '', 'D': '', '+-': '', '-+': ''},
+        {'FO': 'OO', 'OF': 'OO'},
+        {'F': 'XX', 'O': 'YY'},
+        {'X+X': ')', 'X-X': '('},
+        {'X': 'F', 'Y': 'O'})
+
+    def __init__(self, size=1000, width=3, filename='fractal_peano_curve.svg', simplify_tolerance=None):
         self.filename = filename
         self.lsys = LSystem(
             'A -> AFBFA-F-BFCFB+F+AFBFA; B -> BFAFB+F+AFDFA-F-BFAFB; C -> CODOC-O-DOCOD+O+CODOC; D -> DOCOD+O+COCOC-O-DOCOD;',
             start_symbol='A')  # peano-curve
         self.postProcessMap = {'A': '', 'B': '', 'C': '', 'D': ''}
-        self.turtle = SimpleTurtle(90, 10, size, width=width)
-
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        raw_str = self.run_str(iters, init_str=init_str)
-        f_string = _post_process(
-            raw_str, {'A': '', 'B': '', 'C': '', 'D': '', '+-': '', '-+': ''})
-        trimmed_string = _post_process(f_string, {'FO': 'OO', 'OF': 'OO'})
-        split_string = _post_process(trimmed_string, {'F': 'XX', 'O': 'YY'})
-        curved_string = _post_process(split_string, {'X+X': ')', 'X-X': '('})
-        return _post_process(curved_string, {'X': 'F', 'Y': 'O'})
+        self.turtle = SimpleTurtle(90, 10, size, width=width, simplify_tolerance=simplify_tolerance)
 
 
 class Hendragon(Curve):
 
-    def __init__(self, size=1000, width=3, filename='hendragon_curve.svg'):
+    strPipeline = RewritePipeline({'L': 'll', 'R': 'rr'})
+
+    def __init__(self, size=1000, width=3, filename='hendragon_curve.svg', simplify_tolerance=None):
         self.filename = filename
         rules = \
             "M -> lFrFRFMFLFlFr;" + \
@@ -131,20 +402,24 @@ class Hendragon(Curve):
             60,
             10,
             size,
-            width
+            width,
+            simplify_tolerance=simplify_tolerance
         )
 
-    def run_str(self, iters: int, init_str: str = "") -> str:
-        curve_str = self.lsys.run(iters, init_str=init_str)
-        return _post_process(curve_str, {'L': 'll', 'R': 'rr'})
-
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        return self.run_str(iters, init_str=init_str)
-
 
 class Hendragon2(Curve):
 
-    def __init__(self, size=1000, width=3, filename='hendragon2_curve.svg'):
+    strPipeline = RewritePipeline({
+        'M': 'FF',
+        'r': 'F-F',
+        'l': 'F+F',
+        'R': 'F--F',
+        'L': 'F++F'
+    })
+    # run_str also cuts off the ends
+    _symbolwise = False
+
+    def __init__(self, size=1000, width=3, filename='hendragon2_curve.svg', simplify_tolerance=None):
         self.filename = filename
 
         rules = \
@@ -163,27 +438,27 @@ class Hendragon2(Curve):
             60,
             5,
             size,
-            width
+            width,
+            simplify_tolerance=simplify_tolerance
         )
 
     def run_str(self, iters: int, init_str: str = "") -> str:
         curve_str = self.lsys.run(iters, init_str=init_str)
-        post_str = _post_process(curve_str, {
-            'M': 'FF',
-            'r': 'F-F',
-            'l': 'F+F',
-            'R': 'F--F',
-            'L': 'F++F'
-        })
+        return self._str_of(curve_str)
+
+    def _str_of(self, lsys_string: str) -> str:
+        post_str = self.strPipeline.apply(lsys_string)
         return post_str[1:-1]+'FF'
 
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        return self.run_str(iters, init_str=init_str)
+    def _iter_str_of(self, lsys_symbols: Iterable[str]) -> Iterator[str]:
+        post_symbols = self.strPipeline.iter_apply(lsys_symbols)
+        yield from _iter_strip_ends(post_symbols)
+        yield from 'FF'
 
 
 class FractalPlant(Curve):
 
-    def __init__(self, size=1000, width=3, filename='fractalplant_curve.svg'):
+    def __init__(self, size=1000, width=3, filename='fractalplant_curve.svg', simplify_tolerance=None):
         self.filename = filename
 
         rules = \
@@ -197,22 +472,71 @@ class FractalPlant(Curve):
             5,
             size,
             width,
-            start_direction=65
+            start_direction=65,
+            simplify_tolerance=simplify_tolerance
         )
 
-    def run_curved_str(self, iters, init_str: str = "") -> str:
-        return self.run_str(iters, init_str=init_str)
+
+class Generation:
+    # one generation of a curve, see Curve.run_generations
+    def __init__(self, curve: Curve, iters: int, lsys_string: str, curved: bool, init_str: str = "", cache=None,
+                 metrics=None):
+        self.curve = curve
+        self.iters = iters
+        self.lsys_string = lsys_string
+        self.curved = curved
+        self.init_str = init_str
+        self.cache = cache
+        self.metrics = metrics
+
+    # the symbols handed to the turtle
+    @cached_property
+    def sequence(self) -> str:
+        curve = self.curve
+        pipeline = curve._curved_output_pipeline if self.curved else curve._output_pipeline
+        with stage(self.metrics, "post-process", symbols_in=len(self.lsys_string)) as record:
+            sequence = pipeline.apply(curve._str_of(self.lsys_string))
+            record.symbols_out = len(sequence)
+            record.output_bytes = size_of(sequence)
+        return sequence
+
+    @cached_property
+    def geometry(self) -> Geometry:
+        return self._cached("geometry", lambda: self.curve._trace(self.sequence, self.metrics))
+
+    @cached_property
+    def svg(self) -> str:
+        return self._cached("svg", lambda: self.curve._serialize(self.geometry, self.metrics), resolution=None)
+
+    def image(self, size=None, antialias=4):
+        return self._cached("png", lambda: self.curve._rasterize(self.geometry, size, antialias, self.metrics),
+                            size=self.curve._image_size(size), antialias=antialias)
+
+    # same keys as the corresponding runs of the curve
+    def _cached(self, kind: str, compute, **options):
+        return self.curve._cached(self.cache, kind, compute, self.iters, self.init_str, self.curved, **options)
+
+
+def _geometry_bytes(geometry: Geometry) -> int:
+    return geometry.vertices.nbytes + geometry.commands.nbytes + geometry.arcs.nbytes
+
+
+def _with_post_process(pipeline: RewritePipeline, post_process_map) -> RewritePipeline:
+    return pipeline if post_process_map is None else pipeline.then(post_process_map)
 
 
-def _post_process(curve_string: str, replacements: dict) -> str:
-    pattern = re.compile('|'.join([re.escape(x) for x in replacements.keys()]))
-    return pattern.sub(lambda x: replacements[x.group(0)], curve_string)
+# lazy equivalent of curve_string[1:-1]
+def _iter_strip_ends(curve_symbols: Iterable[str]) -> Iterator[str]:
+    curve_symbols = iter(curve_symbols)
+    next(curve_symbols, None)
+    previous = None
+    for char in curve_symbols:
+        if previous is not None:
+            yield previous
+        previous = char
 
 
 # returns an svg-string
 def draw_random_curve(seed: int, curve: Curve, iters: int) -> str:
-    vars = curve.get_variables()
-    consts = curve.get_constants()
-    rng = np.random.default_rng(seed)
-    random_string = ''.join(list(rng.choice(list(vars) + list(consts), iters)))
-    return curve.run_from(random_string, iters=iters)
+    random_string = explore.random_start_strings(curve, 1, iters, seed=seed)[0]
+    return curve.run(iters, init_str=random_string)
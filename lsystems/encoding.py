@@ -0,0 +1,68 @@
+import numpy as np
+
+# largest number of symbols that fit into one byte, code 255 marks unknown symbols
+MAX_SYMBOLS = 255
+_UNKNOWN = 255
+
+
+class Alphabet:
+    # maps every symbol to a one-byte code (its position in the sorted symbols), sequences are stored as uint8 arrays
+    def __init__(self, symbols, name="alphabet"):
+        self.name = name
+        self.symbols = sorted(set(symbols))
+        if len(self.symbols) > MAX_SYMBOLS:
+            raise ValueError(f"{len(self.symbols)} symbols do not fit into one byte")
+        self.codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        # symbols of one byte in latin-1 (i.e. all usual ones) are encoded with a lookup table of all 256 bytes
+        self._single_byte = all(ord(symbol) < 256 for symbol in self.symbols)
+        self._byte_to_code = np.full(256, _UNKNOWN, dtype=np.uint8)
+        self._code_to_byte = np.zeros(len(self.symbols), dtype=np.uint8)
+        if self._single_byte:
+            self._byte_to_code[[ord(symbol) for symbol in self.symbols]] = np.arange(len(self.symbols))
+            self._code_to_byte[:] = [ord(symbol) for symbol in self.symbols]
+        self._to_code_chars = str.maketrans({symbol: chr(code) for code, symbol in enumerate(self.symbols)})
+        self._from_code_chars = str.maketrans({chr(code): symbol for code, symbol in enumerate(self.symbols)})
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def encode(self, string: str) -> np.ndarray:
+        if self._single_byte and string.isascii():
+            codes = self._byte_to_code[np.frombuffer(string.encode("ascii"), dtype=np.uint8)]
+            unknown = np.flatnonzero(codes == _UNKNOWN)
+            if len(unknown) > 0:
+                raise Exception(f"{string[unknown[0]]} not defined in {self.name}")
+            return codes
+        missing = set(string).difference(self.codes)
+        if missing:
+            raise Exception(f"{min(missing)} not defined in {self.name}")
+        return np.frombuffer(string.translate(self._to_code_chars).encode("latin-1"), dtype=np.uint8)
+
+    def decode(self, codes: np.ndarray) -> str:
+        codes = np.asarray(codes, dtype=np.uint8)
+        if self._single_byte:
+            return self._code_to_byte[codes].tobytes().decode("latin-1")
+        return codes.tobytes().decode("latin-1").translate(self._from_code_chars)
+
+
+class Substitution:
+    # replaces every code by a sequence of codes (of possibly another alphabet) with gathers over one flat table of
+    # all replacements. images[code] is the replacement of code
+    def __init__(self, images: list, chunk_size=1 << 16):
+        self.lengths = np.array([len(image) for image in images], dtype=np.int64)
+        self.starts = np.cumsum(self.lengths) - self.lengths
+        self.table = np.concatenate([np.empty(0, dtype=np.uint8)] + [np.asarray(i, dtype=np.uint8) for i in images])
+        # input codes per gather, bounds the temporary index arrays
+        self.chunk_size = chunk_size
+
+    def apply(self, codes: np.ndarray) -> np.ndarray:
+        pieces = [self._apply_chunk(codes[start:start + self.chunk_size])
+                  for start in range(0, len(codes), self.chunk_size)]
+        return np.concatenate([np.empty(0, dtype=np.uint8)] + pieces)
+
+    def _apply_chunk(self, codes: np.ndarray) -> np.ndarray:
+        lengths = self.lengths[codes]
+        ends = np.cumsum(lengths)
+        # position in the table of every output code: start of its replacement + position within it
+        positions = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - lengths - self.starts[codes], lengths)
+        return self.table[positions]
@@ -0,0 +1,191 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+
+from . import analysis
+
+
+@dataclass
+class Candidate:
+    start_string: str
+    # statistics of the straight curve, predicted without expanding anything (None if the curve can not be analysed
+    # symbol by symbol, see Curve._symbol_images)
+    segments: Optional[int] = None  # lines, moves and arcs, see Curve.segment_count
+    extent: Optional[tuple] = None  # (xmin, ymin, xmax, ymax) relative to the start of the turtle
+    displacement: Optional[tuple] = None  # end position of the turtle relative to its start
+
+    @property
+    def width(self) -> float:
+        extent = self._known_extent()
+        return extent[2] - extent[0]
+
+    @property
+    def height(self) -> float:
+        extent = self._known_extent()
+        return extent[3] - extent[1]
+
+    def _known_extent(self) -> tuple:
+        if self.extent is None:
+            raise ValueError(f"the extent of {self.start_string} is not known")
+        return self.extent
+
+
+# the symbols start strings are made of: the symbols of the rules of the l-system (variables and constants) that the
+# turtle can draw on their own, straight and curved. e.g. the start symbol S of Hendragon2 is left out, only its rule
+# turns it into something the turtle can draw
+def start_symbols(curve) -> list:
+    symbols = set("".join(curve.get_variables())).union(curve.get_constants())
+    movement_map = curve.turtle.movement_map
+    return sorted(symbol for symbol in symbols
+                  if all(char in movement_map for pipeline in (curve._output_pipeline, curve._curved_output_pipeline)
+                         for char in pipeline.apply(curve.strPipeline.apply(symbol))))
+
+
+# count random start strings of the given length as uint8 codes of start_symbols(curve), one row per string, all drawn
+# at once
+def random_codes(curve, count: int, length: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.integers(0, len(start_symbols(curve)), size=(count, length), dtype=np.uint8)
+
+
+def decode(curve, codes: np.ndarray) -> list:
+    table = np.frombuffer("".join(start_symbols(curve)).encode("latin-1"), dtype=np.uint8)
+    rows = np.ascontiguousarray(table[codes])
+    return [row.decode("latin-1") for row in rows.view(f"S{codes.shape[1]}").ravel().tolist()] \
+        if codes.shape[1] > 0 else [""] * len(codes)
+
+
+def random_start_strings(curve, count: int, length: int, seed=None) -> list:
+    return decode(curve, random_codes(curve, count, length, np.random.default_rng(seed)))
+
+
+# generates count random start strings of the given length for the curve and returns the ones worth rendering at
+# depth iters, in the order they were drawn (at most limit of them):
+# - duplicates are dropped, also strings that draw the same curve after the post-processing: symbols whose expansions
+#   are drawn the same are interchangeable, symbols drawn as nothing are left out and so are trailing symbols that
+#   only turn the turtle (see _canonical_codes)
+# - segment count, extent and displacement of every remaining string are predicted from the symbols without
+#   expanding anything, strings with fewer than min_segments or more than max_segments segments, curves without any
+#   area (a line or a point) and strings rejected by accept (a function of a Candidate) are dropped.
+# curves that can not be analysed symbol by symbol (e.g. Hendragon2) only lose their exact duplicates
+def explore(curve, count=1000, length=10, iters=4, seed=None, min_segments=1, max_segments=None, accept=None,
+            limit=None) -> list:
+    codes = random_codes(curve, count, length, np.random.default_rng(seed))
+    try:
+        analysis_tables = _SymbolTables(curve, iters)
+    except ValueError:
+        analysis_tables = None
+    keys = codes if analysis_tables is None else analysis_tables.canonical_codes(codes)
+    # first occurrence of every key, in the order they were drawn
+    _, first = np.unique(keys, axis=0, return_index=True)
+    codes = codes[np.sort(first)]
+
+    start_strings = decode(curve, codes)
+    if analysis_tables is None:
+        candidates = [Candidate(start_string) for start_string in start_strings]
+    else:
+        segments, extents, displacements = analysis_tables.statistics(codes)
+        candidates = [Candidate(start_string, int(n), tuple(e), tuple(d))
+                      for start_string, n, e, d in zip(start_strings, segments.tolist(), extents.tolist(),
+                                                       displacements.tolist())]
+        candidates = [c for c in candidates if c.segments >= min_segments and c.width > 0 and c.height > 0 and
+                      (max_segments is None or c.segments <= max_segments)]
+    if accept is not None:
+        candidates = [c for c in candidates if accept(c)]
+    return candidates if limit is None else candidates[:limit]
+
+
+class _SymbolTables:
+    # what every symbol of start_symbols(curve) contributes to the straight curve at depth iters, raises ValueError for
+    # curves that can not be analysed symbol by symbol
+    def __init__(self, curve, iters: int):
+        symbols = start_symbols(curve)
+        images = curve._symbol_images("".join(symbols))
+        movement_map = curve.turtle.movement_map
+        self.headings = analysis.headings_for(movement_map, set("".join(images.values())),
+                                              curve.turtle.start_direction)
+        effects, composer = analysis.symbol_effects(curve.lsys, images, movement_map, self.headings, iters)
+        self.start_heading = self.headings.index(curve.turtle.start_direction) % self.headings.count
+
+        count = self.headings.count
+        self.turn = np.zeros(len(symbols), dtype=np.int64)
+        self.disp = np.zeros((len(symbols), count, 2))
+        self.bbox = np.zeros((len(symbols), count, 4))
+        # +1 for push, -1 for pop, 0 otherwise
+        self.stack_op = np.zeros(len(symbols), dtype=np.int64)
+        for code, symbol in enumerate(symbols):
+            effect = effects[symbol]
+            if effect is composer.push or effect is composer.pop:
+                self.stack_op[code] = 1 if effect is composer.push else -1
+                continue
+            self.turn[code] = effect.turn
+            self.disp[code] = effect.disp
+            self.bbox[code] = effect.bbox
+        self.segments = np.array([curve.segment_count(iters, init_str=symbol) for symbol in symbols], dtype=np.int64)
+        self.classes = _expansion_classes(curve.lsys, images, symbols, iters)
+
+    # every row as the classes of its symbols (see _expansion_classes), without the symbols drawn as nothing and the
+    # trailing symbols without segments. rows with the same canonical codes draw the same curve
+    def canonical_codes(self, codes: np.ndarray) -> np.ndarray:
+        classes = self.classes[codes]
+        has_segments = self.segments[codes] > 0
+        # nothing after the last symbol with segments is drawn (unless it is a pop, which moves the turtle)
+        last = codes.shape[1] - 1 - np.argmax((has_segments | (self.stack_op[codes] < 0))[:, ::-1], axis=1)
+        keep = (classes > 0) & (np.arange(codes.shape[1]) <= last[:, None])
+        # kept classes moved to the front of every row (in order), the rest is 0
+        order = np.argsort(~keep, axis=1, kind="stable")
+        return np.where(np.take_along_axis(keep, order, axis=1), np.take_along_axis(classes, order, axis=1), 0)
+
+    # segments, extent (xmin, ymin, xmax, ymax) and displacement of every row
+    def statistics(self, codes: np.ndarray) -> tuple:
+        count = self.headings.count
+        segments = self.segments[codes].sum(axis=1)
+        turns = self.turn[codes]
+        # heading before every symbol
+        heading = (self.start_heading + np.cumsum(turns, axis=1) - turns) % count
+        disp = self.disp[codes, heading]
+        bbox = self.bbox[codes, heading]
+        start = np.cumsum(disp, axis=1) - disp
+        extents = np.stack((np.minimum((start[..., 0] + bbox[..., 0]).min(axis=1, initial=0), 0),
+                            np.minimum((start[..., 1] + bbox[..., 1]).min(axis=1, initial=0), 0),
+                            np.maximum((start[..., 0] + bbox[..., 2]).max(axis=1, initial=0), 0),
+                            np.maximum((start[..., 1] + bbox[..., 3]).max(axis=1, initial=0), 0)), axis=1)
+        displacements = disp.sum(axis=1)
+        # push and pop (e.g. FractalPlant) are followed one row at a time
+        for row in np.flatnonzero(np.any(self.stack_op[codes] != 0, axis=1)):
+            extents[row], displacements[row] = self._row_statistics(codes[row])
+        return segments, extents, displacements
+
+    def _row_statistics(self, codes: np.ndarray) -> tuple:
+        heading, position = self.start_heading, np.zeros(2)
+        extent = np.zeros(4)
+        stack = []
+        for code in codes.tolist():
+            if self.stack_op[code] > 0:
+                stack.append((heading, position))
+            elif self.stack_op[code] < 0:
+                if not stack:
+                    # the turtle would fail, drop the string
+                    return np.zeros(4), np.zeros(2)
+                heading, position = stack.pop()
+            else:
+                extent[:2] = np.minimum(extent[:2], position + self.bbox[code, heading, :2])
+                extent[2:] = np.maximum(extent[2:], position + self.bbox[code, heading, 2:])
+                position = position + self.disp[code, heading]
+                heading = (heading + self.turn[code]) % self.headings.count
+        return extent, position
+
+
+# a class for every symbol such that symbols of the same class are drawn the same when expanded iters times. the
+# classes are found level by level: at depth 0 a symbol is its turtle symbols, at depth d the classes of its
+# replacement at depth d-1. class 0 is drawn as nothing. two symbols whose expansions happen to be the same although
+# their replacements are not may end up in different classes
+def _expansion_classes(lsys, images: dict, symbols: list, iters: int) -> np.ndarray:
+    alphabet = set(images)
+    ids: dict = {"": 0}
+    classes = {symbol: ids.setdefault(images[symbol], len(ids)) for symbol in alphabet}
+    for _ in range(iters):
+        ids = {(): 0}
+        classes = {symbol: ids.setdefault(tuple(c for c in (classes[child] for child in lsys.rules.get(symbol, symbol))
+                                                if c != 0), len(ids))
+                   for symbol in alphabet}
+    return np.array([classes[symbol] for symbol in symbols], dtype=np.int64)
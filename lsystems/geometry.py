@@ -0,0 +1,364 @@
+from dataclasses import dataclass
+from itertools import chain, islice
+from math import cos, sin, radians, gcd
+from typing import Iterable, Iterator, Optional
+import numpy as np
+
+from .encoding import Alphabet, MAX_SYMBOLS
+from .svg import Cursor, Line, Rotation, Arc, PushPosition, PopPosition
+
+# opcodes of the vectorized turtle, CUSTOM is any other Movement (traced symbol by symbol with the movement itself)
+LINE, MOVE, ROTATE, ARC, PUSH, POP, CUSTOM = range(7)
+# command of the path segment a custom movement generates
+_SEGMENT_COMMANDS = {"L": LINE, "M": MOVE, "A": ARC}
+
+
+class Headings:
+    # all directions the turtle can take when every angle is a multiple of step (which divides 360)
+    def __init__(self, angles):
+        step = 360
+        for angle in angles:
+            if angle != round(angle):
+                raise ValueError(f"angle {angle} is not a whole number of degrees")
+            step = gcd(step, int(round(angle)))
+        self.step = step
+        self.count = 360 // step
+        self.unit = np.array([_unit_vector(h * step) for h in range(self.count)])
+
+    def index(self, angle) -> int:
+        return int(round(angle)) // self.step
+
+
+# (cos, sin) of a whole number of degrees: exact at multiples of 90 degrees and symmetric, e.g. cos(60) == sin(30)
+def _unit_vector(degrees: int) -> tuple:
+    quadrant, angle = divmod(degrees % 360, 90)
+    if angle > 45:
+        c, s = sin(radians(90 - angle)), cos(radians(90 - angle))
+    else:
+        c, s = cos(radians(angle)), sin(radians(angle))
+    for _ in range(quadrant):
+        c, s = -s, c
+    return c, s
+
+
+class MovementTable:
+    # the movement map as arrays: opcode and the movement relative to a cursor at (0, 0) heading in direction 0
+    def __init__(self, movement_map: dict):
+        self.chars = sorted(movement_map)
+        self.keys = np.array([ord(c) for c in self.chars], dtype=np.uint32)
+        # one byte per symbol if possible, the codes are the positions in chars
+        self.alphabet = Alphabet(self.chars, name="movement map") if len(self.chars) <= MAX_SYMBOLS else None
+        self.ops = np.empty(len(self.chars), dtype=np.uint8)
+        self.dx = np.zeros(len(self.chars))
+        self.dy = np.zeros(len(self.chars))
+        self.turn = np.zeros(len(self.chars))
+        # rx, ry, large_arc, sweep of arcs
+        self.arc = np.zeros((len(self.chars), 4))
+        self.movements = [movement_map[char] for char in self.chars]
+        # False if a movement can not be represented by the arrays
+        self.vectorized = True
+
+        for i, movement in enumerate(self.movements):
+            if isinstance(movement, PushPosition):
+                self.ops[i] = PUSH
+                continue
+            if isinstance(movement, PopPosition):
+                self.ops[i] = POP
+                continue
+            if isinstance(movement, Line):
+                self.ops[i] = LINE if movement.draw else MOVE
+            elif isinstance(movement, Rotation):
+                self.ops[i] = ROTATE
+            elif isinstance(movement, Arc):
+                self.ops[i] = ARC
+                self.arc[i] = (movement.rx, movement.ry, abs(movement.angle) > 180, movement.angle > 0)
+            else:
+                self.ops[i] = CUSTOM
+                self.vectorized = False
+                continue
+            _, end_cursor = movement.generate(Cursor(x=0, y=0, dir=0))
+            self.dx[i] = end_cursor.x
+            self.dy[i] = end_cursor.y
+            self.turn[i] = end_cursor.dir
+
+    # index into the table for every symbol of the sequence. a uint8 array is taken as such indices already (the
+    # codes of an Alphabet of the movement map, see SVGTurtle.encode)
+    def encode(self, sequence) -> np.ndarray:
+        if isinstance(sequence, np.ndarray):
+            if len(sequence) > 0 and sequence.max() >= len(self.chars):
+                raise Exception(f"code {sequence.max()} not defined in movement map")
+            return sequence
+        if not isinstance(sequence, str):
+            sequence = "".join(sequence)
+        if self.alphabet is not None:
+            return self.alphabet.encode(sequence)
+        codes = np.frombuffer(sequence.encode("utf-32-le"), dtype="<u4")
+        idx = np.searchsorted(self.keys, codes)
+        idx[idx == len(self.keys)] = 0
+        unknown = np.flatnonzero(self.keys[idx] != codes) if len(self.keys) else np.arange(len(codes))
+        if len(unknown) > 0:
+            raise Exception(f"{sequence[unknown[0]]} not defined in movement map")
+        return idx
+
+
+class _Brackets:
+    # matches PushPosition/PopPosition symbols, such that the effect of everything between a matching pair can be
+    # undone at the pop with one cumulative sum (instead of walking through the sequence with a stack)
+    def __init__(self, ops: np.ndarray):
+        n = len(ops)
+        is_push = ops == PUSH
+        is_pop = ops == POP
+        depth_after = np.cumsum(is_push.astype(np.int64) - is_pop)
+        if n > 0 and depth_after.min() < 0:
+            raise Exception("PopPosition without corresponding PushPosition found")
+        self.pops = np.flatnonzero(is_pop)
+        # pushes that are not closed within ops
+        self.open_pushes = np.flatnonzero(is_push)
+        if len(self.pops) == 0:
+            return
+
+        # nesting depth of every symbol (a push/pop belongs to the outer level)
+        depth = depth_after - is_push
+        pushes = np.flatnonzero(is_push)
+        push_levels = depth_after[pushes]
+        pop_levels = depth[self.pops] + 1
+        # on each level pushes and pops alternate, so the k-th pop of a level closes the k-th push of that level
+        push_order = np.argsort(push_levels, kind="stable")
+        pop_order = np.argsort(pop_levels, kind="stable")
+        sorted_push_levels = push_levels[push_order]
+        sorted_pop_levels = pop_levels[pop_order]
+        rank = np.arange(len(pop_order)) - np.searchsorted(sorted_pop_levels, sorted_pop_levels)
+        matching = np.empty(len(self.pops), dtype=np.int64)
+        matching[pop_order] = pushes[push_order[np.searchsorted(sorted_push_levels, sorted_pop_levels) + rank]]
+        self.open_pushes = np.setdiff1d(pushes, matching, assume_unique=True)
+
+        # sorting by (depth, position) makes the symbols directly inside a pair (i.e. not in a nested pair)
+        # a contiguous range, so their sum is a difference of one cumulative sum
+        key = depth * (n + 1) + np.arange(n)
+        self.order = np.argsort(key, kind="stable")
+        sorted_key = key[self.order]
+        self.lo = np.searchsorted(sorted_key, pop_levels * (n + 1) + matching, side="right")
+        self.hi = np.searchsorted(sorted_key, pop_levels * (n + 1) + self.pops, side="left")
+
+    def close(self, values: np.ndarray) -> np.ndarray:
+        if len(self.pops) == 0:
+            return values
+        cumulative = np.concatenate(([0.0], np.cumsum(values[self.order])))
+        closed = values.copy()
+        closed[self.pops] -= cumulative[self.hi] - cumulative[self.lo]
+        return closed
+
+
+@dataclass
+class Geometry:
+    # structure of arrays describing the path drawn by the turtle
+    vertices: np.ndarray  # (N+1, 2), starts at the position of the turtle before the first segment
+    commands: np.ndarray  # (N,) LINE, MOVE or ARC, the segment ending in vertices[i+1]
+    arcs: np.ndarray  # (number of ARC commands, 5): rx, ry, x-axis-rotation, large_arc flag, sweep flag
+    bbox: tuple  # (xmin, ymin, xmax, ymax) of all vertices
+
+    def __len__(self):
+        return len(self.commands)
+
+    def path_data(self) -> str:
+        segments = ["M {:g} {:g}".format(*self.vertices[0].tolist())]
+        arcs = iter(self.arcs.tolist())
+        for command, (x, y) in zip(self.commands.tolist(), self.vertices[1:].tolist()):
+            if command == LINE:
+                segments.append(f"L {x:0.4f} {y:0.4f}")
+            elif command == MOVE:
+                segments.append(f"M {x:0.4f} {y:0.4f}")
+            else:
+                rx, ry, rotation, large_arc, sweep = next(arcs)
+                segments.append(f"A {rx:0.4f} {ry:0.4f} {rotation:g} {large_arc:.0f} {sweep:.0f} {x:0.4f} {y:0.4f}")
+        return " ".join(segments)
+
+
+class Tracer:
+    # vectorized turtle that can be fed the sequence in chunks: position, direction and the stack of saved
+    # positions are carried over from one call of trace to the next
+    def __init__(self, movement_map: dict, start_direction=0):
+        self.table = MovementTable(movement_map)
+        self.cursor = Cursor(x=0, y=0, dir=start_direction)
+        self.stack: list = []
+        # with whole-numbered angles the heading only takes finitely many values: the displacement of every symbol
+        # for every heading is looked up (no trigonometry per symbol, no drift of the heading)
+        self.headings: Optional[Headings]
+        try:
+            self.headings = Headings([start_direction] + self.table.turn.tolist())
+        except ValueError:
+            self.headings = None
+        if self.headings is not None:
+            cos_h, sin_h = self.headings.unit[:, 0], self.headings.unit[:, 1]
+            dx, dy = self.table.dx[:, None], self.table.dy[:, None]
+            # flat (symbol, heading) tables for x and y
+            self.displacement_x = (dx * cos_h - dy * sin_h).ravel()
+            self.displacement_y = (dx * sin_h + dy * cos_h).ravel()
+
+    # the geometry of the next chunk of the sequence, starting at the current cursor
+    def trace(self, sequence) -> Geometry:
+        idx = self.table.encode(sequence)
+        if not self.table.vectorized:
+            return self._trace_scalar(idx)
+        ops = self.table.ops[idx]
+        # pops that go below the depth at the start of the chunk restore positions saved in an earlier chunk,
+        # the chunk is split there into parts without such pops
+        is_pop = ops == POP
+        depth = np.cumsum((ops == PUSH).astype(np.int64) - is_pop)
+        previous_min = np.minimum.accumulate(np.concatenate(([0], depth[:-1])))
+        restarts = np.flatnonzero(is_pop & (depth < previous_min)).tolist()
+
+        start = np.array([[self.cursor.x, self.cursor.y]])
+        parts = []
+        for part, (begin, end) in enumerate(zip([0] + restarts, restarts + [len(idx)])):
+            if part > 0:
+                if len(self.stack) == 0:
+                    raise Exception("PopPosition without corresponding PushPosition found")
+                self.cursor = self.stack.pop()
+                parts.append((np.array([[self.cursor.x, self.cursor.y]]), np.array([MOVE], dtype=np.uint8),
+                              np.empty((0, 5))))
+                begin += 1
+            parts.append(self._trace_part(idx[begin:end]))
+
+        vertices = np.concatenate([start] + [p[0] for p in parts])
+        commands = np.concatenate([np.empty(0, dtype=np.uint8)] + [p[1] for p in parts])
+        arcs = np.concatenate([np.empty((0, 5))] + [p[2] for p in parts])
+        xmin, ymin = vertices.min(axis=0).tolist()
+        xmax, ymax = vertices.max(axis=0).tolist()
+        return Geometry(vertices, commands, arcs, (xmin, ymin, xmax, ymax))
+
+    def _trace_part(self, idx):
+        table = self.table
+        ops = table.ops[idx]
+        brackets = _Brackets(ops)
+
+        turn = brackets.close(table.turn[idx])
+        heading = _accumulate(self.cursor.dir, turn) - turn
+        if self.headings is None:
+            radians = np.radians(heading)
+            cos = np.cos(radians)
+            sin = np.sin(radians)
+            dx = table.dx[idx]
+            dy = table.dy[idx]
+            step_x, step_y = dx * cos - dy * sin, dx * sin + dy * cos
+        else:
+            # headings are sums of whole numbers here, i.e. exact multiples of step
+            count = self.headings.count
+            h = (heading / self.headings.step).astype(np.int64) % count
+            flat = idx.astype(np.int64) * count + h
+            step_x, step_y = self.displacement_x[flat], self.displacement_y[flat]
+        x = _accumulate(self.cursor.x, brackets.close(step_x))
+        y = _accumulate(self.cursor.y, brackets.close(step_y))
+
+        for push in brackets.open_pushes.tolist():
+            self.stack.append(Cursor(x=x[push], y=y[push], dir=heading[push]))
+        if len(idx) > 0:
+            self.cursor = Cursor(x=x[-1], y=y[-1], dir=heading[-1] + turn[-1])
+
+        at_vertex = (ops != ROTATE) & (ops != PUSH)
+        vertices = np.stack((x[at_vertex], y[at_vertex]), axis=1)
+        # pops are moves back to the saved position
+        commands = ops[at_vertex]
+        commands[commands == POP] = MOVE
+        is_arc = commands == ARC
+        arcs = np.empty((np.count_nonzero(is_arc), 5))
+        arcs[:, [0, 1, 3, 4]] = table.arc[idx[at_vertex][is_arc]]
+        arcs[:, 2] = heading[at_vertex][is_arc]
+        return vertices, commands, arcs
+
+    # symbol by symbol with the movements themselves. a custom movement is drawn as one segment to its end cursor,
+    # with the (absolute) command its path segment starts with, none for an empty segment
+    def _trace_scalar(self, idx) -> Geometry:
+        table = self.table
+        ops = table.ops.tolist()
+        cursor = self.cursor.copy()
+        vertices = [(cursor.x, cursor.y)]
+        commands = []
+        arcs = []
+        for i in idx.tolist():
+            op = ops[i]
+            if op == PUSH:
+                self.stack.append(cursor.copy())
+                continue
+            if op == POP:
+                if len(self.stack) == 0:
+                    raise Exception("PopPosition without corresponding PushPosition found")
+                cursor = self.stack.pop()
+                op = MOVE
+            elif op == CUSTOM:
+                segment, end_cursor = table.movements[i].generate(cursor)
+                cursor = end_cursor.copy()
+                op = _SEGMENT_COMMANDS.get(segment.lstrip()[:1], ROTATE)
+                if op == ARC:
+                    rx, ry, rotation, large_arc, sweep = segment.split()[1:6]
+                    arcs.append((float(rx), float(ry), float(rotation), float(large_arc), float(sweep)))
+            else:
+                # the cursor is the tracer's own (only copies are pushed or taken over), it is moved in place
+                if op == ARC:
+                    rx, ry, large_arc, sweep = table.arc[i].tolist()
+                    arcs.append((rx, ry, cursor.dir, large_arc, sweep))
+                table.movements[i].advance(cursor)
+            if op == ROTATE:
+                continue
+            vertices.append((cursor.x, cursor.y))
+            commands.append(op)
+        self.cursor = cursor
+
+        positions = np.array(vertices, dtype=float)
+        xmin, ymin = positions.min(axis=0).tolist()
+        xmax, ymax = positions.max(axis=0).tolist()
+        return Geometry(positions, np.array(commands, dtype=np.uint8), np.array(arcs, dtype=float).reshape(-1, 5),
+                        (xmin, ymin, xmax, ymax))
+
+
+# start + cumulative sum of values, summed in the same order no matter where the sequence was split into chunks
+def _accumulate(start, values: np.ndarray) -> np.ndarray:
+    return np.cumsum(np.concatenate(([start], values)))[1:]
+
+
+def to_geometry(sequence, movement_map: dict, start_direction=0) -> Geometry:
+    return Tracer(movement_map, start_direction=start_direction).trace(sequence)
+
+
+# geometry of a (lazy) sequence, chunk by chunk. every chunk starts where the previous one ended. symbols may also
+# be an array of codes or an iterable of such arrays
+def iter_geometry(symbols: Iterable, movement_map: dict, start_direction=0,
+                  chunk_size=1 << 16) -> Iterator[Geometry]:
+    tracer = Tracer(movement_map, start_direction=start_direction)
+    if isinstance(symbols, np.ndarray):
+        symbols = [symbols]
+    symbols = iter(symbols)
+    first = next(symbols, None)
+    if isinstance(first, np.ndarray):
+        # chunks of codes (see MovementTable.encode)
+        for codes in chain([first], symbols):
+            for start in range(0, len(codes), chunk_size):
+                yield tracer.trace(codes[start:start + chunk_size])
+        return
+    symbols = chain([] if first is None else [first], symbols)
+    while True:
+        chunk = "".join(islice(symbols, chunk_size))
+        if not chunk:
+            return
+        yield tracer.trace(chunk)
+
+
+# the chunks of iter_geometry (at least one) as one geometry
+def join_geometry(chunks: list) -> Geometry:
+    vertices = np.concatenate([chunks[0].vertices[:1]] + [chunk.vertices[1:] for chunk in chunks])
+    commands = np.concatenate([chunk.commands for chunk in chunks])
+    arcs = np.concatenate([chunk.arcs for chunk in chunks])
+    return Geometry(vertices, commands, arcs, union_bbox(chunk.bbox for chunk in chunks))
+
+
+def union_bbox(bboxes: Iterable[tuple]) -> tuple:
+    xmins, ymins, xmaxs, ymaxs = zip(*bboxes)
+    return min(xmins), min(ymins), max(xmaxs), max(ymaxs)
+
+
+# computes all turtle positions at once. returns the (N,2) array of vertices (starting at the origin) and for each
+# vertex whether the turtle moved there with its pen up
+def trace(sequence, movement_map: dict, start_direction=0):
+    geometry = to_geometry(sequence, movement_map, start_direction=start_direction)
+    pen_up = np.concatenate(([True], geometry.commands == MOVE))
+    return geometry.vertices, pen_up
@@ -1,6 +1,206 @@
 import re
+import sys
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from functools import cached_property
+from itertools import accumulate
 # rules dict: V->replacement
-from typing import Tuple
+from typing import Iterable, Iterator, Optional, Tuple
+import numpy as np
+
+from .encoding import Alphabet, Substitution
+from .parallel import run_parallel
+from .storage import GenerationStore
+
+
+class RewritePlan:
+    # a rule set compiled once: single-character heads are applied with one str.translate, heads of several
+    # characters with one precompiled regex (alternatives sorted longest first, i.e. longest match wins)
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self.heads = sorted(rules.keys(), key=len, reverse=True)
+        self.max_len = max(map(len, self.heads), default=1)
+        self.table = str.maketrans({k: v for k, v in rules.items() if len(k) == 1})
+        multi_heads = [h for h in self.heads if len(h) > 1]
+        self.pattern = re.compile('(' + '|'.join([re.escape(h) for h in multi_heads]) + ')') if multi_heads else None
+
+    def apply(self, string: str) -> str:
+        if self.pattern is None:
+            return string.translate(self.table)
+        # split keeps the matched heads at the odd positions, everything in between only contains single-char heads
+        parts = self.pattern.split(string)
+        parts[::2] = [p.translate(self.table) for p in parts[::2]]
+        parts[1::2] = [self.rules[p] for p in parts[1::2]]
+        return ''.join(parts)
+
+    # rewrites the longest prefix of string whose rewriting does not depend on the symbols following string.
+    # returns the rewritten prefix and the rest, which has to be rewritten together with what follows
+    def apply_prefix(self, string: str) -> Tuple[str, str]:
+        if self.pattern is None:
+            return string.translate(self.table), ""
+        # a head starting at cut or later might continue after the end of string
+        cut = max(len(string) - (self.max_len - 1), 0)
+        parts = self.pattern.split(string)
+        ends = list(accumulate(map(len, parts)))
+        i = bisect_right(ends, cut)
+        if i == len(parts):
+            return self.apply(string), ""
+        start = ends[i] - len(parts[i])
+        if i % 2 == 1 and start < cut:
+            # a head that was matched completely before the end
+            i, cut = i + 1, ends[i]
+        elif i % 2 == 0:
+            parts[i] = parts[i][:cut - start]
+            i += 1
+        else:
+            cut = start
+        prefix = parts[:i]
+        prefix[::2] = [p.translate(self.table) for p in prefix[::2]]
+        prefix[1::2] = [self.rules[p] for p in prefix[1::2]]
+        return ''.join(prefix), string[cut:]
+
+    # lazy version of apply, only ever looks ahead as far as the longest rule head
+    def iter_apply(self, symbols: Iterable[str]) -> Iterator[str]:
+        rules = self.rules
+        if self.max_len == 1:
+            for char in symbols:
+                yield from rules.get(char, char)
+            return
+
+        buffer = ""
+        for char in symbols:
+            buffer += char
+            while len(buffer) >= self.max_len:
+                replacement, buffer = self._consume(buffer)
+                yield from replacement
+        while buffer:
+            replacement, buffer = self._consume(buffer)
+            yield from replacement
+
+    # iter_apply applied times times. instead of chaining one generator per application (which runs into the
+    # recursion limit for deep generations), every application keeps a buffer of its pending symbols and the
+    # replacements still to be passed on are kept on an explicit stack
+    def iter_apply_repeated(self, symbols: Iterable[str], times: int) -> Iterator[str]:
+        if times == 0:
+            yield from symbols
+            return
+        rules = self.rules
+        buffers = [""] * times
+        # (application the symbols are passed to, symbols)
+        stack = [(0, iter(symbols))]
+        while True:
+            if not stack:
+                # the input is exhausted: flush the first application with pending symbols (all before it are empty)
+                level = next((i for i, buffer in enumerate(buffers) if buffer), None)
+                if level is None:
+                    return
+                replacement, buffers[level] = self._consume(buffers[level])
+            else:
+                level, pending = stack[-1]
+                if self.max_len == 1 and level == times - 1:
+                    # the last application of single-character heads needs no buffer
+                    stack.pop()
+                    for char in pending:
+                        yield from rules.get(char, char)
+                    continue
+                symbol = next(pending, None)
+                if symbol is None:
+                    stack.pop()
+                    continue
+                buffers[level] += symbol
+                if len(buffers[level]) < self.max_len:
+                    continue
+                replacement, buffers[level] = self._consume(buffers[level])
+            if level == times - 1:
+                yield from replacement
+            else:
+                stack.append((level + 1, iter(replacement)))
+
+    # replacement of the head at the start of buffer (longest match) and the rest of buffer
+    def _consume(self, buffer: str) -> Tuple[str, str]:
+        for head in self.heads:
+            if buffer.startswith(head):
+                return self.rules[head], buffer[len(head):]
+        return buffer[0], buffer[1:]
+
+
+class RewritePipeline:
+    # a fixed chain of rewriting stages (each one behaves like a separate pass of RewritePlan.apply), compiled once.
+    # a stage with only single-character heads is fused into the stage before it, since it just rewrites the
+    # replacements of that stage (and the characters it leaves alone).
+    def __init__(self, *stages: dict):
+        self.stages = stages
+        fused: list = []
+        for stage in stages:
+            if fused and all(len(head) == 1 for head in stage):
+                fused[-1] = _fuse(fused[-1], stage)
+            else:
+                fused.append(dict(stage))
+        self.plans = [RewritePlan(stage) for stage in fused]
+
+    # every symbol is rewritten on its own (all heads are single characters)
+    def is_context_free(self) -> bool:
+        return all(plan.max_len == 1 for plan in self.plans)
+
+    def then(self, *stages: dict) -> 'RewritePipeline':
+        return RewritePipeline(*self.stages, *stages)
+
+    def apply(self, string: str) -> str:
+        for plan in self.plans:
+            string = plan.apply(string)
+        return string
+
+    def iter_apply(self, symbols: Iterable[str]) -> Iterator[str]:
+        symbols = iter(symbols)
+        for plan in self.plans:
+            symbols = plan.iter_apply(symbols)
+        return symbols
+
+
+def _fuse(first: dict, second: dict) -> dict:
+    table = str.maketrans(second)
+    fused = {head: replacement.translate(table) for head, replacement in first.items()}
+    for head, replacement in second.items():
+        fused.setdefault(head, replacement)
+    return fused
+
+
+class ExpansionCache:
+    # expansions of single symbols keyed by (rule set, symbol, depth). the least recently used ones are evicted once
+    # the cached strings take more than max_bytes
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        expansion = self._entries.get(key)
+        if expansion is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return expansion
+
+    def put(self, key, expansion):
+        size = sys.getsizeof(expansion)
+        if size > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = expansion
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= sys.getsizeof(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+# shared by all l-systems (and therefore all curves) that are not given a cache of their own
+default_cache = ExpansionCache()
 
 
 class LSystem:
@@ -20,26 +220,184 @@ class LSystem:
             rule_dict[var] = tail
         return rule_dict, vars, all_elements.difference(vars)
 
-    def __init__(self, spec: str, start_symbol: str):
+    def __init__(self, spec: str, start_symbol: str, cache: Optional[ExpansionCache] = None):
         self.start_symbol = start_symbol
         self.rules, self.variables, self.constants = self._parse_spec(spec)
+        self.cache = default_cache if cache is None else cache
+        self._rules_key = tuple(sorted(self.rules.items()))
+        self.plan = RewritePlan(self.rules)
+        self._rule_counts = {head: Counter(tail) for head, tail in self.rules.items()}
+        # alphabets and substitutions for start strings with symbols of their own, see alphabet_for
+        self._alphabets: dict = {}
+        self._substitutions: dict = {}
+
+    # max_length rejects runs whose result would be longer, before expanding anything if the length can be predicted
+    def run_from(self, initial_string: str, number_of_iterations: int, max_length=None) -> str:
+        if max_length is not None and self.is_context_free():
+            self._check_length(self.length(number_of_iterations, initial_string), max_length)
+        if self.is_context_free():
+            # every symbol expands on its own, so the generation is assembled from the (cached) expansions
+            expansions: dict = {c: self._expand(c, number_of_iterations) for c in set(initial_string)}
+            current_string = initial_string.translate(str.maketrans(expansions))
+            if max_length is not None:
+                self._check_length(len(current_string), max_length)
+            return current_string
 
-    def run_from(self, initial_string: str, number_of_iterations: int) -> str:
         current_string = initial_string
         i = 0
         while i < number_of_iterations:
-            # https://stackoverflow.com/questions/6116978/how-to-replace-multiple-substrings-of-a-string
             # in each iteration, we have to apply all rules at once!
-            pattern = re.compile('|'.join([re.escape(x) for x in self.rules.keys()]))
-            current_string = pattern.sub(lambda x: self.rules[x.group(0)], current_string)
+            current_string = self.plan.apply(current_string)
+            if max_length is not None:
+                self._check_length(len(current_string), max_length)
             i += 1
         return current_string
 
-    def run(self, number_of_iterations: int, init_str=None) -> str:
+    def run(self, number_of_iterations: int, init_str=None, max_length=None) -> str:
         if init_str:
-            return self.run_from(initial_string=init_str, number_of_iterations=number_of_iterations)
+            return self.run_from(initial_string=init_str, number_of_iterations=number_of_iterations,
+                                 max_length=max_length)
         else:
-            return self.run_from(initial_string=self.start_symbol, number_of_iterations=number_of_iterations)
+            return self.run_from(initial_string=self.start_symbol, number_of_iterations=number_of_iterations,
+                                 max_length=max_length)
+
+    def _expand(self, symbol: str, depth: int) -> str:
+        return self.expand_levels(symbol, depth, self.cache, self._rules_key, lambda c: c, self._translate)
+
+    @staticmethod
+    def _translate(tail: str, level: dict) -> str:
+        return tail.translate(str.maketrans({c: level[c] for c in set(tail)}))
+
+    # symbol expanded depth times, built bottom-up: the expansions of level d of all symbols reachable from symbol are
+    # combined from level d-1, so the depth is not bounded by the recursion limit. leaf(c) is the expansion of c at
+    # depth 0, combine(tail, level) the expansion of a rule tail from the expansions of the level below. expansions
+    # are cached in cache under (key, symbol, depth)
+    def expand_levels(self, symbol: str, depth: int, cache: ExpansionCache, key, leaf, combine):
+        if depth == 0 or symbol not in self.rules:
+            return leaf(symbol)
+        expansion = cache.get((key, symbol, depth))
+        if expansion is not None:
+            return expansion
+        reachable = self._reachable(symbol)
+        heads = [c for c in reachable if c in self.rules]
+        level = {c: leaf(c) for c in reachable}
+        for d in range(1, depth + 1):
+            expansions = {}
+            for head in heads:
+                expansion = cache.get((key, head, d))
+                if expansion is None:
+                    expansion = combine(self.rules[head], level)
+                    cache.put((key, head, d), expansion)
+                expansions[head] = expansion
+            level.update(expansions)
+        return level[symbol]
+
+    # all symbols occurring in the expansions of symbol (including itself)
+    def _reachable(self, symbol: str) -> set:
+        reachable, pending = {symbol}, [symbol]
+        while pending:
+            for child in self.rules.get(pending.pop(), ""):
+                if child not in reachable:
+                    reachable.add(child)
+                    pending.append(child)
+        return reachable
+
+    @staticmethod
+    def _check_length(length: int, max_length: int):
+        if length > max_length:
+            raise ValueError(f"sequence would have {length} symbols, more than the maximum of {max_length}")
+
+    # the generation can be predicted symbol by symbol (no rule head has more than one character)
+    def is_context_free(self) -> bool:
+        return self.plan.max_len == 1
+
+    # number of occurrences of every symbol in the given generation, computed with the substitution-matrix
+    # recurrence instead of expanding anything
+    def symbol_counts(self, number_of_iterations: int, init_str=None) -> dict:
+        if not self.is_context_free():
+            raise ValueError("symbol counts need rules whose heads are single symbols")
+        counts = Counter(init_str if init_str else self.start_symbol)
+        for _ in range(number_of_iterations):
+            next_counts: Counter = Counter()
+            for symbol, count in counts.items():
+                for child, child_count in self._rule_counts.get(symbol, {symbol: 1}).items():
+                    next_counts[child] += count * child_count
+            counts = next_counts
+        return dict(counts)
+
+    def length(self, number_of_iterations: int, init_str=None) -> int:
+        return sum(self.symbol_counts(number_of_iterations, init_str=init_str).values())
+
+    # yields the symbols of the given generation one at a time (depth-first), without ever building the full string.
+    # memory is bounded by number_of_iterations * (length of the longest rule), any number of iterations works
+    def iter_symbols(self, number_of_iterations: int, init_str=None) -> Iterator[str]:
+        return self.plan.iter_apply_repeated(init_str if init_str else self.start_symbol, number_of_iterations)
+
+    # all symbols of the l-system with their one-byte codes
+    @cached_property
+    def alphabet(self) -> Alphabet:
+        return Alphabet(set(self.start_symbol).union(*self.variables, *self.constants))
+
+    # self.alphabet extended by the symbols of init_str that none of the rules mentions (they are left alone by the
+    # rules), the codes of the generations of init_str
+    def alphabet_for(self, init_str=None) -> Alphabet:
+        extra = frozenset(init_str or "").difference(self.alphabet.symbols)
+        if not extra:
+            return self.alphabet
+        if extra not in self._alphabets:
+            self._alphabets[extra] = Alphabet(extra.union(self.alphabet.symbols))
+        return self._alphabets[extra]
+
+    # the rules as a substitution of codes of self.alphabet, only for context-free rules
+    @cached_property
+    def substitution(self) -> Substitution:
+        return self.substitution_for(self.alphabet)
+
+    # the rules as a substitution of codes of the given alphabet (see alphabet_for), only for context-free rules
+    def substitution_for(self, alphabet: Alphabet) -> Substitution:
+        key = tuple(alphabet.symbols)
+        if key not in self._substitutions:
+            self._substitutions[key] = Substitution([alphabet.encode(self.rules.get(symbol, symbol))
+                                                     for symbol in alphabet.symbols])
+        return self._substitutions[key]
+
+    # the given generation as uint8 codes of self.alphabet_for(init_str) (see Alphabet.decode), one byte per symbol.
+    # it is concatenated from the (cached) encoded expansions of its symbols
+    def run_encoded(self, number_of_iterations: int, init_str=None, max_length=None) -> np.ndarray:
+        initial_string = init_str if init_str else self.start_symbol
+        alphabet = self.alphabet_for(initial_string)
+        if not self.is_context_free():
+            return alphabet.encode(self.run_from(initial_string, number_of_iterations, max_length=max_length))
+        if max_length is not None:
+            self._check_length(self.length(number_of_iterations, initial_string), max_length)
+        return np.concatenate([self._expand_encoded(c, number_of_iterations, alphabet) for c in initial_string])
+
+    def _expand_encoded(self, symbol: str, depth: int, alphabet: Alphabet) -> np.ndarray:
+        return self.expand_levels(symbol, depth, self.cache, (self._rules_key, tuple(alphabet.symbols)),
+                                  alphabet.encode, lambda tail, level: np.concatenate([level[c] for c in tail]))
+
+    # writes the generations up to number_of_iterations as files of one-byte codes into directory, chunk by chunk and
+    # resuming an interrupted run, see storage.GenerationStore. returns the store, store.open(number_of_iterations)
+    # maps the last generation into memory
+    def run_to_disk(self, number_of_iterations: int, directory: str, init_str=None, chunk_size=1 << 22):
+        store = GenerationStore(self, directory, init_str=init_str, chunk_size=chunk_size)
+        store.run(number_of_iterations)
+        return store
+
+    # the given generation as uint8 codes of self.alphabet_for(init_str), every generation is rewritten in pieces of
+    # about chunk_size symbols by a pool of worker processes, see parallel.run_parallel
+    def run_parallel(self, number_of_iterations: int, init_str=None, workers=None, chunk_size=1 << 20) -> np.ndarray:
+        return run_parallel(self, number_of_iterations, init_str=init_str, workers=workers, chunk_size=chunk_size)
+
+    # yields generations 0 to number_of_iterations, each one rewritten from the one before
+    def iter_generations(self, number_of_iterations: int, init_str=None, max_length=None) -> Iterator[str]:
+        current_string = init_str if init_str else self.start_symbol
+        yield current_string
+        for _ in range(number_of_iterations):
+            current_string = self.plan.apply(current_string)
+            if max_length is not None:
+                self._check_length(len(current_string), max_length)
+            yield current_string
 
     def get_variables(self) -> set:
         return self.variables
@@ -0,0 +1,103 @@
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Optional
+import numpy as np
+
+
+@dataclass
+class StageMetrics:
+    # one stage of a render: expand (rewriting of the l-system), post-process (rewriting into turtle symbols), turtle
+    # (tracing into geometry), serialize (svg) or raster (image)
+    name: str
+    seconds: float = 0.0
+    symbols_in: Optional[int] = None
+    symbols_out: Optional[int] = None
+    output_bytes: Optional[int] = None  # size of the string or array the stage produced
+    segments: Optional[int] = None  # lines, moves and arcs of the geometry
+    peak_bytes: Optional[int] = None  # most memory allocated during the stage, only with Metrics(trace_memory=True)
+
+
+class Metrics:
+    # collects the metrics of every stage of the renders it is passed to (e.g. Curve.run(..., metrics=metrics)).
+    # every callback is called with the StageMetrics of a stage once it is finished. trace_memory measures the peak
+    # memory of every stage with tracemalloc, which slows the stages down considerably
+    def __init__(self, callbacks=(), trace_memory=False):
+        self.stages = []
+        self.callbacks = list(callbacks)
+        self.trace_memory = trace_memory
+
+    @contextmanager
+    def stage(self, name: str, symbols_in=None):
+        record = StageMetrics(name, symbols_in=symbols_in)
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            if self.trace_memory:
+                record.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+            self.stages.append(record)
+            for callback in self.callbacks:
+                callback(record)
+
+    # total seconds per stage name
+    def seconds(self) -> dict:
+        seconds: dict = {}
+        for record in self.stages:
+            seconds[record.name] = seconds.get(record.name, 0.0) + record.seconds
+        return seconds
+
+    def as_dicts(self) -> list:
+        return [asdict(record) for record in self.stages]
+
+    def __str__(self):
+        lines = [f"{'stage':<14}{'seconds':>10}{'symbols in':>14}{'symbols out':>14}{'bytes':>14}{'segments':>12}"]
+        for r in self.stages:
+            lines.append(f"{r.name:<14}{r.seconds:>10.4f}{_count(r.symbols_in):>14}{_count(r.symbols_out):>14}"
+                         f"{_count(r.output_bytes):>14}{_count(r.segments):>12}")
+        return "\n".join(lines)
+
+
+class _DisabledStage:
+    # stands in for the StageMetrics of a stage when there is no Metrics, everything set on it is dropped
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED = _DisabledStage()
+
+
+# the stage of metrics as a context manager yielding its StageMetrics, with metrics=None only a shared object that
+# ignores everything (so an instrumented render costs one function call per stage)
+def stage(metrics, name: str, symbols_in=None):
+    if metrics is None:
+        return _DISABLED
+    return metrics.stage(name, symbols_in=symbols_in)
+
+
+def size_of(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+def _count(value) -> str:
+    return "" if value is None else f"{value:,}"
@@ -0,0 +1,130 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+import numpy as np
+
+# the rewriter of the l-system a worker process was started for, see _init_worker
+_worker_rewriter: Optional['ChunkRewriter'] = None
+
+
+# rewrites a generation of one-byte codes (of alphabet, see LSystem.alphabet_for) in pieces. the pieces are cut only
+# where no rule head can span the cut, so rewriting them one by one gives the same as rewriting the whole generation
+class ChunkRewriter:
+    def __init__(self, lsys, alphabet):
+        self.plan = lsys.plan
+        self.alphabet = alphabet
+        self.substitution = lsys.substitution_for(alphabet) if lsys.is_context_free() else None
+        # a cut between two symbols is unsafe if the first one can continue a head (it appears before the last
+        # character of a head) and the second one can be continued (appears after the first character)
+        self._continues = np.zeros(len(self.alphabet), dtype=bool)
+        self._continued = np.zeros(len(self.alphabet), dtype=bool)
+        for head in self.plan.heads:
+            self._continues[[self.alphabet.codes[c] for c in head[:-1]]] = True
+            self._continued[[self.alphabet.codes[c] for c in head[1:]]] = True
+        # most symbols a single symbol can be rewritten to (a head of k symbols counts as k symbols)
+        self.max_ratio = max([math.ceil(len(tail) / len(head)) for head, tail in self.plan.rules.items()] + [1])
+
+    def rewrite(self, codes: np.ndarray) -> np.ndarray:
+        if self.substitution is not None:
+            return self.substitution.apply(codes)
+        return self.alphabet.encode(self.plan.apply(self.alphabet.decode(codes)))
+
+    # start positions of pieces of about chunk_size symbols (a piece grows until the next safe cut) and the end
+    def cuts(self, codes: np.ndarray, chunk_size: int) -> list:
+        cuts = [0]
+        position = chunk_size
+        while position < len(codes):
+            if self.plan.max_len > 1:
+                window = codes[position - 1:position + chunk_size]
+                safe = np.flatnonzero(~(self._continues[window[:-1]] & self._continued[window[1:]]))
+                if len(safe) == 0:
+                    position += chunk_size
+                    continue
+                position += int(safe[0])
+            cuts.append(position)
+            position += chunk_size
+        cuts.append(len(codes))
+        return cuts
+
+    # upper bound of the length of every rewritten piece, exact for context-free rules
+    def bounds(self, codes: np.ndarray, cuts: list) -> list:
+        if self.substitution is None:
+            return [(end - start) * self.max_ratio for start, end in zip(cuts, cuts[1:])]
+        return [int(np.bincount(codes[start:end], minlength=len(self.alphabet)) @ self.substitution.lengths)
+                for start, end in zip(cuts, cuts[1:])]
+
+
+# the given generation as uint8 codes of lsys.alphabet_for(init_str), every generation is cut into pieces of about
+# chunk_size symbols that are rewritten by a pool of worker processes (workers=1 rewrites them in this process). the
+# generations are passed to the workers in shared memory and the workers write their pieces into a shared buffer, so
+# no symbols are pickled. generations of a single piece are rewritten right here
+def run_parallel(lsys, number_of_iterations: int, init_str=None, workers=None, chunk_size=1 << 20) -> np.ndarray:
+    initial_string = init_str if init_str else lsys.start_symbol
+    rewriter = ChunkRewriter(lsys, lsys.alphabet_for(initial_string))
+    codes = rewriter.alphabet.encode(initial_string)
+    if workers == 1:
+        for _ in range(number_of_iterations):
+            codes = np.concatenate([np.empty(0, dtype=np.uint8)] + [
+                rewriter.rewrite(codes[start:end]) for start, end in _pieces(rewriter.cuts(codes, chunk_size))])
+        return codes
+    # the worker processes are only started once the first generation is cut into several pieces
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rewriter,)) as executor:
+        for _ in range(number_of_iterations):
+            cuts = rewriter.cuts(codes, chunk_size)
+            if len(cuts) <= 2:
+                codes = rewriter.rewrite(codes)
+            else:
+                codes = _rewrite_shared(executor, rewriter, codes, cuts)
+    return codes
+
+
+def _pieces(cuts: list):
+    return zip(cuts, cuts[1:])
+
+
+def _rewrite_shared(executor, rewriter: ChunkRewriter, codes: np.ndarray, cuts: list) -> np.ndarray:
+    offsets = np.concatenate(([0], np.cumsum(rewriter.bounds(codes, cuts)))).tolist()
+    source = shared_memory.SharedMemory(create=True, size=max(len(codes), 1))
+    try:
+        target = shared_memory.SharedMemory(create=True, size=max(offsets[-1], 1))
+        try:
+            source_codes = np.ndarray(len(codes), dtype=np.uint8, buffer=source.buf)
+            source_codes[:] = codes
+            del source_codes
+            futures = [executor.submit(_rewrite_piece, source.name, target.name, start, end, offset)
+                       for (start, end), offset in zip(_pieces(cuts), offsets)]
+            lengths = [future.result() for future in futures]
+            # the pieces are packed together, their bounds may leave gaps in between
+            target_codes = np.ndarray(offsets[-1], dtype=np.uint8, buffer=target.buf)
+            result = np.concatenate([target_codes[offset:offset + length] for offset, length in zip(offsets, lengths)])
+            del target_codes
+            return result
+        finally:
+            target.close()
+            target.unlink()
+    finally:
+        source.close()
+        source.unlink()
+
+
+def _init_worker(rewriter: ChunkRewriter):
+    global _worker_rewriter
+    _worker_rewriter = rewriter
+
+
+# rewrites source[start:end] into target[offset:], returns the length of the rewritten piece
+def _rewrite_piece(source_name: str, target_name: str, start: int, end: int, offset: int) -> int:
+    if _worker_rewriter is None:
+        raise RuntimeError("pieces are only rewritten in worker processes started by run_parallel")
+    source = shared_memory.SharedMemory(name=source_name)
+    target = shared_memory.SharedMemory(name=target_name)
+    try:
+        rewritten = _worker_rewriter.rewrite(np.ndarray(end, dtype=np.uint8, buffer=source.buf)[start:])
+        target_codes = np.ndarray(offset + len(rewritten), dtype=np.uint8, buffer=target.buf)
+        target_codes[offset:] = rewritten
+        del target_codes
+        return len(rewritten)
+    finally:
+        source.close()
+        target.close()
@@ -1,15 +1,33 @@
+import csv
 import os
 import shutil
-import numpy as np
-import matplotlib.pyplot as plt
-import cairosvg
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+from matplotlib.figure import Figure
 
-import PIL
-import io
+from . import explore
+from .metrics import Metrics, stage
 
 
-def draw_random_curves(Curve, base_dir, num_curves=20, random_seed=42, max_iters=4, curved=False):
-    # Generation of random curves
+@dataclass
+class RenderResult:
+    index: int
+    start_string: str
+    filename: Optional[str]  # None if the curve could not be rendered
+    error: Optional[str] = None  # None if the curve was rendered
+    metrics: Optional[Metrics] = None  # stages of all generations, only with collect_metrics
+
+
+def draw_random_curves(Curve, base_dir, num_curves=20, random_seed=42, max_iters=4, curved=False, workers=None,
+                       thumbnail_size=(400, 400), cache=None, collect_metrics=False, candidates_per_curve=20):
+    # Generation of random curves, rendered by a pool of worker processes (workers=1 renders in this process).
+    # returns the result of every curve, ordered by index. the start strings only depend on random_seed, so the same
+    # curves come out no matter how many workers there are
+    # candidates_per_curve * num_curves start strings are drawn at once, only the first num_curves that are neither
+    # equivalent to an earlier one nor degenerate are rendered (see explore.explore), there may be fewer
+    # cache (a RenderCache, see cache.py) is shared by the workers, thumbnails rendered before are not rendered again
+    # collect_metrics records the stages of every curve in its result (see metrics.py)
 
     if os.path.exists(base_dir):
         rename_str = base_dir + "_BAK"
@@ -19,33 +37,60 @@ def draw_random_curves(Curve, base_dir, num_curves=20, random_seed=42, max_iters
 
     os.mkdir(base_dir)
 
+    results = []
+    with open(os.path.join(base_dir, "results.csv"), "w", newline="") as index_file:
+        writer = csv.writer(index_file)
+        writer.writerow(["index", "start_string", "filename", "error"])
+        index_file.flush()
+        for result in render_random_curves(Curve, base_dir, num_curves, random_seed, max_iters, curved, workers,
+                                           thumbnail_size, cache, collect_metrics, candidates_per_curve):
+            # written as soon as a curve is done, so an interrupted batch still leaves a consistent index
+            writer.writerow([result.index, result.start_string, result.filename or "", result.error or ""])
+            index_file.flush()
+            results.append(result)
+    return sorted(results, key=lambda r: r.index)
+
+
+# renders the curves and yields their results in the order they are finished
+def render_random_curves(Curve, base_dir, num_curves=20, random_seed=42, max_iters=4, curved=False, workers=None,
+                         thumbnail_size=(400, 400), cache=None, collect_metrics=False, candidates_per_curve=20):
+    # fixed random-seed for reproducibility
+    candidates = explore.explore(Curve(), count=num_curves * candidates_per_curve, length=10, iters=max_iters,
+                                 seed=random_seed, limit=num_curves)
+    tasks = [(Curve, base_dir, i, candidate.start_string, max_iters, curved, thumbnail_size, cache, collect_metrics)
+             for i, candidate in enumerate(candidates)]
+    if workers == 1:
+        for task in tasks:
+            yield _render_random_curve(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_render_random_curve, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _render_random_curve(Curve, base_dir, index, start_string, max_iters, curved, thumbnail_size, cache,
+                         collect_metrics) -> RenderResult:
     c = Curve()
-    chars = list(set(c.postProcessMap.keys()).union(set(c.get_constants())))
-    rng = np.random.default_rng(random_seed)  # fixed random-seed for reproducibility
-
-    for i in range(num_curves):
-        try:
-            start_string = "".join(rng.choice(chars, size=10))
-            n_rows = 3
-            n_cols = 2
-
-            fig, ax = plt.subplots(nrows=n_rows, ncols=n_cols)
-            filename = base_dir + "/" + start_string + ".svg"
-
-            for iters in range(max_iters+1):
-                c = Curve()
-                if curved:
-                    svg_string = c.run_curved(iters=iters, init_str=start_string)
-                else:
-                    svg_string = c.run_str(iters=iters, init_str=start_string)
-                row = int(iters / n_cols)
-                col = iters % n_cols
-                img_png = cairosvg.svg2png(svg_string)
-                img = PIL.Image.open(io.BytesIO(img_png))
-                ax[row, col].imshow(img)
+    metrics = Metrics() if collect_metrics else None
+    try:
+        n_cols = 2
+        n_rows = max(3, (max_iters + n_cols) // n_cols)
+
+        fig = Figure()
+        ax = fig.subplots(nrows=n_rows, ncols=n_cols)
+        filename = base_dir + "/" + start_string + ".svg"
+
+        for generation in c.run_generations(max_iters, init_str=start_string, curved=curved, cache=cache,
+                                            metrics=metrics):
+            row = int(generation.iters / n_cols)
+            col = generation.iters % n_cols
+            img = generation.image(size=thumbnail_size)
+            ax[row, col].imshow(img, cmap="gray", vmin=0, vmax=255)
 
+        with stage(metrics, "figure"):
             fig.savefig(filename)
-            plt.close()
+        return RenderResult(index, start_string, filename, metrics=metrics)
 
-        except:
-            pass
+    except Exception as e:
+        return RenderResult(index, start_string, None, f"{type(e).__name__}: {e}", metrics=metrics)
@@ -0,0 +1,107 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .geometry import Geometry, MOVE, ARC
+
+
+# draws the geometry as black lines on white into a grayscale image of the given size (width, height) in pixels.
+# viewbox = (x, y, width, height) is the part of the plane that is shown, scaled and centered like an svg viewBox.
+# stroke is the line width in the units of the geometry. antialias > 1 draws the image that many times larger and
+# scales it down again
+def rasterize(geometry: Geometry, size: tuple, viewbox: tuple, stroke=3, antialias=4) -> Image.Image:
+    factor = max(int(antialias), 1)
+    width, height = size[0] * factor, size[1] * factor
+    view_x, view_y, view_width, view_height = viewbox
+    scale = min(width / view_width, height / view_height)
+    # pixel (i, j) covers [i, i+1) x [j, j+1) in svg, but is centered at (i, j) in Pillow
+    offset = np.array([(width - view_width * scale) / 2 - view_x * scale - 0.5,
+                       (height - view_height * scale) / 2 - view_y * scale - 0.5])
+
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    line_width = max(int(round(stroke * scale)), 1)
+    for run in _polylines(geometry, scale):
+        points = run * scale + offset
+        if len(points) > 1:
+            draw.line(points.ravel().tolist(), fill=0, width=line_width, joint="curve")
+        # round line caps
+        radius = line_width / 2
+        for x, y in (points[0], points[-1]):
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=0)
+    if factor > 1:
+        image = image.resize(size, Image.Resampling.BOX)
+    return image
+
+
+# the drawn parts of the path as arrays of points, arcs are approximated by lines that are less than a quarter of a
+# pixel off
+def _polylines(geometry: Geometry, scale: float, tolerance=0.25) -> list:
+    vertices = geometry.vertices
+    commands = geometry.commands
+    if len(commands) == 0:
+        return []
+
+    # number of points for every command: one for lines and moves, more for arcs
+    counts = np.ones(len(commands), dtype=np.int64)
+    is_arc = commands == ARC
+    arc_index = np.flatnonzero(is_arc)
+    if len(arc_index) > 0:
+        center, radii, rotation, theta, delta = _arc_centers(vertices[arc_index], vertices[arc_index + 1],
+                                                             geometry.arcs)
+        pixel_radius = np.maximum(radii.max(axis=1) * scale, tolerance)
+        step = 2 * np.arccos(np.maximum(1 - tolerance / pixel_radius, -1))
+        counts[arc_index] = np.maximum(np.ceil(np.abs(delta) / step), 1)
+
+    command_of_point = np.repeat(np.arange(len(commands)), counts)
+    points = vertices[command_of_point + 1].copy()
+    if len(arc_index) > 0:
+        # position of the point within its arc: k/n for k = 1..n
+        first_point = np.cumsum(counts) - counts
+        k = np.arange(len(points)) - first_point[command_of_point] + 1
+        arc_of_point = np.cumsum(is_arc) - 1
+        on_arc = is_arc[command_of_point]
+        a = arc_of_point[command_of_point[on_arc]]
+        angle = theta[a] + delta[a] * k[on_arc] / counts[command_of_point[on_arc]]
+        cos, sin = np.cos(rotation[a]), np.sin(rotation[a])
+        ex, ey = radii[a, 0] * np.cos(angle), radii[a, 1] * np.sin(angle)
+        points[on_arc] = center[a] + np.stack((cos * ex - sin * ey, sin * ex + cos * ey), axis=1)
+        # the last point of an arc is exactly its end vertex
+        last = on_arc & (k == counts[command_of_point])
+        points[last] = vertices[command_of_point[last] + 1]
+
+    points = np.concatenate((vertices[:1], points))
+    pen_up = np.concatenate(([True], commands[command_of_point] == MOVE))
+    starts = np.flatnonzero(pen_up)
+    ends = np.append(starts[1:], len(points))
+    # a run starts at a move and ends before the next one
+    return [points[start:end] for start, end in zip(starts.tolist(), ends.tolist()) if end - start > 1]
+
+
+# center parameterization of svg arcs given by their start and end points and (rx, ry, rotation, large_arc, sweep),
+# following the svg implementation notes
+def _arc_centers(start: np.ndarray, end: np.ndarray, arcs: np.ndarray):
+    radii = np.abs(arcs[:, :2]).copy()
+    rotation = np.radians(arcs[:, 2])
+    cos, sin = np.cos(rotation), np.sin(rotation)
+    half = (start - end) / 2
+    x1 = cos * half[:, 0] + sin * half[:, 1]
+    y1 = -sin * half[:, 0] + cos * half[:, 1]
+
+    radii = np.maximum(radii, 1e-12)
+    # radii that are too small are scaled up until the arc fits
+    scaling = np.sqrt(np.maximum((x1 / radii[:, 0]) ** 2 + (y1 / radii[:, 1]) ** 2, 1))
+    radii *= scaling[:, None]
+    rx, ry = radii[:, 0], radii[:, 1]
+    numerator = (rx * ry) ** 2 - (rx * y1) ** 2 - (ry * x1) ** 2
+    denominator = (rx * y1) ** 2 + (ry * x1) ** 2
+    coefficient = np.sqrt(np.maximum(numerator, 0) / np.where(denominator > 0, denominator, 1))
+    coefficient[arcs[:, 3] == arcs[:, 4]] *= -1
+    cx = coefficient * rx * y1 / ry
+    cy = -coefficient * ry * x1 / rx
+    center = np.stack((cos * cx - sin * cy, sin * cx + cos * cy), axis=1) + (start + end) / 2
+
+    theta = np.arctan2((y1 - cy) / ry, (x1 - cx) / rx)
+    delta = np.mod(np.arctan2((-y1 - cy) / ry, (-x1 - cx) / rx) - theta, 2 * np.pi)
+    negative = (arcs[:, 4] == 0) & (delta > 0)
+    delta[negative] -= 2 * np.pi
+    return center, radii, rotation, theta, delta
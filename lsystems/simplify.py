@@ -0,0 +1,88 @@
+import numpy as np
+
+from .geometry import Geometry, LINE, MOVE
+
+# lines whose directions differ by less than this (relative to their lengths) count as collinear
+COLLINEAR_EPSILON = 1e-9
+
+
+# removes segments that do not change the drawing: zero-length lines and moves, moves directly followed by another
+# move and the vertices between collinear lines. with a tolerance > 0 runs of lines are also simplified with
+# Douglas-Peucker, no vertex moves further than tolerance away from the drawn path.
+# returns the simplified geometry and the number of removed segments. the bounding box is kept, so the svg shows
+# the same part of the plane
+def simplify(geometry: Geometry, tolerance=0.0) -> tuple:
+    vertices = geometry.vertices
+    commands = geometry.commands
+    n = len(commands)
+    if n == 0:
+        return geometry, 0
+
+    is_line = commands == LINE
+    is_move = commands == MOVE
+    delta = np.diff(vertices, axis=0)
+    # keep[i] says whether segment i (ending in vertices[i+1]) stays
+    keep = ~((is_line | is_move) & np.all(delta == 0, axis=1))
+    keep[:-1] &= ~(is_move[:-1] & is_move[1:])
+    vertices = np.concatenate((vertices[:1], vertices[1:][keep]))
+    commands = commands[keep]
+    is_line = commands == LINE
+
+    # lines that continue the previous line in the same direction
+    delta = np.diff(vertices, axis=0)
+    cross = delta[:-1, 0] * delta[1:, 1] - delta[:-1, 1] * delta[1:, 0]
+    dot = np.einsum("ij,ij->i", delta[:-1], delta[1:])
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    collinear = is_line[:-1] & is_line[1:] & (dot > 0) & \
+        (np.abs(cross) <= COLLINEAR_EPSILON * lengths[:-1] * lengths[1:])
+    keep = np.ones(len(commands), dtype=bool)
+    keep[:-1] = ~collinear
+    if tolerance > 0:
+        keep &= _douglas_peucker(vertices, is_line, keep, tolerance)
+    vertices = np.concatenate((vertices[:1], vertices[1:][keep]))
+    commands = commands[keep]
+    return Geometry(vertices, commands, geometry.arcs, geometry.bbox), n - len(commands)
+
+
+# which of the remaining vertices at the end of lines survive Douglas-Peucker, all runs of lines are simplified
+# together, one level of the recursion at a time
+def _douglas_peucker(vertices: np.ndarray, is_line: np.ndarray, candidates: np.ndarray, tolerance) -> np.ndarray:
+    # the points of the runs, only vertices that are still kept take part
+    points = np.concatenate(([0], np.flatnonzero(candidates) + 1))
+    segment_is_line = is_line[points[1:] - 1]
+    keep = np.ones(len(points), dtype=bool)
+    # a run of lines goes from a point that does not end a line (or ends the run before) to the last line of the run
+    run_start = np.flatnonzero(segment_is_line & ~np.concatenate(([False], segment_is_line[:-1])))
+    run_end = np.flatnonzero(segment_is_line & ~np.concatenate((segment_is_line[1:], [False]))) + 1
+    lo, hi = run_start, run_end
+    while True:
+        active = hi - lo > 1
+        lo, hi = lo[active], hi[active]
+        if len(lo) == 0:
+            break
+        counts = hi - lo - 1
+        range_of = np.repeat(np.arange(len(lo)), counts)
+        inner = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + lo[range_of] + 1
+        distance = _segment_distance(vertices[points[inner]], vertices[points[lo[range_of]]],
+                                     vertices[points[hi[range_of]]])
+        first = np.cumsum(counts) - counts
+        farthest = np.maximum.reduceat(distance, first)
+        # first point of every range at the largest distance
+        is_farthest = distance == farthest[range_of]
+        split = inner[is_farthest][np.unique(range_of[is_farthest], return_index=True)[1]]
+        drop = farthest <= tolerance
+        keep[inner[drop[range_of]]] = False
+        lo, hi, split = lo[~drop], hi[~drop], split[~drop]
+        lo, hi = np.concatenate((lo, split)), np.concatenate((split, hi))
+
+    result = np.zeros(len(candidates), dtype=bool)
+    result[points[1:][keep[1:]] - 1] = True
+    return result
+
+
+def _segment_distance(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    ab = b - a
+    length2 = np.einsum("ij,ij->i", ab, ab)
+    t = np.clip(np.einsum("ij,ij->i", p - a, ab) / np.where(length2 > 0, length2, 1), 0, 1)
+    closest = a + t[:, None] * ab
+    return np.hypot(p[:, 0] - closest[:, 0], p[:, 1] - closest[:, 1])
@@ -0,0 +1,110 @@
+import json
+import os
+from typing import Iterator
+import numpy as np
+
+
+class GenerationStore:
+    # generations of an l-system as files of one-byte codes (lsys.alphabet_for(init_str)) in a directory. every
+    # generation is rewritten chunk by chunk from the file of the previous one, so memory is bounded by chunk_size
+    # (times the length of the longest rule) no matter how long the generations get. an interrupted run continues
+    # where it stopped: finished generations are kept and a generation in progress resumes after its last written
+    # chunk
+    def __init__(self, lsys, directory: str, init_str=None, chunk_size=1 << 22):
+        self.lsys = lsys
+        self.directory = directory
+        self.initial_string = init_str if init_str else lsys.start_symbol
+        self.chunk_size = chunk_size
+        self.alphabet = lsys.alphabet_for(self.initial_string)
+        os.makedirs(directory, exist_ok=True)
+
+        description = {"rules": sorted(lsys.rules.items()), "initial_string": self.initial_string,
+                       "alphabet": self.alphabet.symbols}
+        description_path = os.path.join(directory, "lsystem.json")
+        if os.path.exists(description_path):
+            with open(description_path, encoding="utf-8") as f:
+                if json.load(f) != json.loads(json.dumps(description)):
+                    raise ValueError(f"{directory} holds the generations of another l-system")
+        else:
+            write_json(description_path, description)
+
+    def path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"generation_{generation}.u8")
+
+    # number of the last generation that was written completely, -1 if there is none
+    def completed(self) -> int:
+        generation = -1
+        while os.path.exists(self.path(generation + 1)):
+            generation += 1
+        return generation
+
+    # writes all generations up to number_of_iterations that are missing, returns the last one (see open)
+    def run(self, number_of_iterations: int) -> np.ndarray:
+        if self.completed() < 0:
+            self._write_atomic(self.path(0), self.alphabet.encode(self.initial_string))
+        for generation in range(self.completed() + 1, number_of_iterations + 1):
+            self._rewrite(generation)
+        return self.open(number_of_iterations)
+
+    # read-only memory map of a generation
+    def open(self, generation: int) -> np.ndarray:
+        if os.path.getsize(self.path(generation)) == 0:
+            return np.empty(0, dtype=np.uint8)
+        return np.memmap(self.path(generation), dtype=np.uint8, mode="r")
+
+    def iter_chunks(self, generation: int, chunk_size=None) -> Iterator[np.ndarray]:
+        codes = self.open(generation)
+        chunk_size = self.chunk_size if chunk_size is None else chunk_size
+        for start in range(0, len(codes), chunk_size):
+            yield np.array(codes[start:start + chunk_size])
+
+    # the symbols of a generation, one decoded chunk after the other
+    def iter_strings(self, generation: int, chunk_size=None) -> Iterator[str]:
+        for chunk in self.iter_chunks(generation, chunk_size=chunk_size):
+            yield self.alphabet.decode(chunk)
+
+    def _rewrite(self, generation: int):
+        source = self.open(generation - 1)
+        target = self.path(generation) + ".part"
+        progress_path = self.path(generation) + ".progress"
+        # symbols read from the source, bytes written to the target and symbols read but not rewritten yet
+        progress: dict = {"read": 0, "written": 0, "carry": ""}
+        if os.path.exists(progress_path) and os.path.exists(target):
+            with open(progress_path, encoding="utf-8") as f:
+                progress = json.load(f)
+        substitution = self.lsys.substitution_for(self.alphabet) if self.lsys.is_context_free() else None
+
+        with open(target, "r+b" if progress["written"] > 0 else "wb") as out:
+            # anything after the last recorded chunk is from an interrupted write
+            out.truncate(progress["written"])
+            out.seek(progress["written"])
+            read, carry = progress["read"], progress["carry"]
+            while read < len(source):
+                chunk = np.array(source[read:read + self.chunk_size])
+                read += len(chunk)
+                if substitution is not None:
+                    rewritten = substitution.apply(chunk)
+                else:
+                    string, carry = self.lsys.plan.apply_prefix(carry + self.alphabet.decode(chunk))
+                    if read == len(source):
+                        string, carry = string + self.lsys.plan.apply(carry), ""
+                    rewritten = self.alphabet.encode(string)
+                out.write(rewritten.tobytes())
+                out.flush()
+                os.fsync(out.fileno())
+                write_json(progress_path, {"read": read, "written": out.tell(), "carry": carry})
+        os.replace(target, self.path(generation))
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+    def _write_atomic(self, path: str, codes: np.ndarray):
+        with open(path + ".part", "wb") as f:
+            f.write(codes.tobytes())
+        os.replace(path + ".part", path)
+
+
+# replaces the file at path with the json of value, a reader sees either the old or the new file
+def write_json(path: str, value):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(path + ".tmp", path)
@@ -3,6 +3,7 @@ from math import sin, cos, radians, tan, atan, pi, isclose
 
 
 class Cursor:
+    __slots__ = ("x", "y", "dir")
     x: float
     y: float
     dir: float
@@ -20,30 +21,53 @@ class Cursor:
     def __str__(self):
         return f"Cursor(x={self.x:0.4f}, y={self.y:0.4f}, dir={self.dir:0.4f})"
 
+    def copy(self) -> 'Cursor':
+        return Cursor(self.x, self.y, self.dir)
+
 
 class Movement(ABC):
+    __slots__ = ()
+
+    # the svg path segment and the cursor after the movement, start_cursor is not changed
     @abstractmethod
     def generate(self, previous_cursor: Cursor) -> tuple[str, Cursor]:
         pass
 
+    # moves the cursor in place (the tracer does so for movement maps it can not vectorize). falls back on generate,
+    # the movements here override it to do without any allocations
+    def advance(self, cursor: Cursor) -> None:
+        _, end_cursor = self.generate(cursor)
+        cursor.x = end_cursor.x
+        cursor.y = end_cursor.y
+        cursor.dir = end_cursor.dir
+
 
 class Line(Movement):
+    __slots__ = ("length", "draw", "_cmd")
+
     def __init__(self, length, draw=True):
         self.length = length
         self.draw = draw
+        self._cmd = "L" if draw else "M"
 
     def generate(self, start_cursor):
         rad = radians(start_cursor.dir)
         x_end = start_cursor.x + self.length*cos(rad)
         y_end = start_cursor.y + self.length*sin(rad)
-        cmd = "L" if self.draw else "M"
-        d = f"{cmd} {x_end:0.4f} {y_end:0.4f}"
+        d = f"{self._cmd} {x_end:0.4f} {y_end:0.4f}"
 
         end_cursor = Cursor(x_end, y_end, start_cursor.dir)
         return (d, end_cursor)
 
+    def advance(self, cursor):
+        rad = radians(cursor.dir)
+        cursor.x += self.length*cos(rad)
+        cursor.y += self.length*sin(rad)
+
 
 class Rotation(Movement):
+    __slots__ = ("angle",)
+
     def __init__(self, angle):
         # negative because in svg the y axis goes down, not up
         self.angle = -angle
@@ -58,8 +82,13 @@ class Rotation(Movement):
 
         return d, end_cursor
 
+    def advance(self, cursor):
+        cursor.dir += self.angle
+
 
 class Arc(Movement):
+    __slots__ = ("rx", "ry", "angle", "_dx", "_dy", "_large_arc", "_sweep")
+
     def __init__(self, angle, rx, ry=None):
         self.rx = rx
         self.ry = ry if ry is not None else rx
@@ -69,30 +98,41 @@ class Arc(Movement):
             raise Exception(
                 f"{angle} needs in interval [-360, 360], but not 0")
 
-    def generate(self, start_cursor):
-        x = start_cursor.x
-        y = start_cursor.y
-        dir = start_cursor.dir
-        rad_dir = radians(dir)
+        # the end point relative to a cursor at (0, 0) heading in direction 0 only depends on the arc
         rad_angle = atan(tan(radians(self.angle))*self.rx/self.ry) % (2*pi)
         if abs(self.angle) > 90 and abs(self.angle) < 270:
             rad_angle = (rad_angle+pi) % (2*pi)
         if self.angle < 0:
             rad_angle = rad_angle - 2*pi
-        dx = self.rx*sin(abs(rad_angle))
+        self._dx = self.rx*sin(abs(rad_angle))
         # rotation left or right defines where the center of rotation is
-        dy = (self.ry - self.ry*cos(rad_angle)) * (1 if self.angle > 0 else -1)
-        x_end = x + dx * cos(rad_dir) - dy * sin(rad_dir)
-        y_end = y + dx * sin(rad_dir) + dy * cos(rad_dir)
-        large_arc = 1 if abs(self.angle) > 180 else 0
-        sweep = 1 if self.angle > 0 else 0
-        d = f"A {self.rx:0.4f} {self.ry:0.4f} {dir} {large_arc} {sweep} {x_end:0.4f} {y_end:0.4f}"
+        self._dy = (self.ry - self.ry*cos(rad_angle)) * (1 if self.angle > 0 else -1)
+        self._large_arc = 1 if abs(self.angle) > 180 else 0
+        self._sweep = 1 if self.angle > 0 else 0
+
+    def generate(self, start_cursor):
+        dir = start_cursor.dir
+        rad_dir = radians(dir)
+        cos_dir = cos(rad_dir)
+        sin_dir = sin(rad_dir)
+        x_end = start_cursor.x + self._dx * cos_dir - self._dy * sin_dir
+        y_end = start_cursor.y + self._dx * sin_dir + self._dy * cos_dir
+        d = f"A {self.rx:0.4f} {self.ry:0.4f} {dir} {self._large_arc} {self._sweep} {x_end:0.4f} {y_end:0.4f}"
         end_cursor = Cursor(x=x_end, y=y_end, dir=dir+self.angle)
         return d, end_cursor
 
+    def advance(self, cursor):
+        rad_dir = radians(cursor.dir)
+        cos_dir = cos(rad_dir)
+        sin_dir = sin(rad_dir)
+        cursor.x += self._dx * cos_dir - self._dy * sin_dir
+        cursor.y += self._dx * sin_dir + self._dy * cos_dir
+        cursor.dir += self.angle
+
 
 class PushPosition(Movement):
     """["""
+    __slots__ = ("stack",)
 
     def __init__(self, stack: list):
         self.stack = stack
@@ -102,9 +142,14 @@ class PushPosition(Movement):
 
         return "", start_cursor
 
+    def advance(self, cursor):
+        # a copy, the cursor itself keeps moving
+        self.stack.append(cursor.copy())
+
 
 class PopPosition(Movement):
     """]"""
+    __slots__ = ("stack",)
 
     def __init__(self, stack: list):
         self.stack = stack
@@ -117,3 +162,12 @@ class PopPosition(Movement):
         d = f"M {saved_cursor.x:0.4f} {saved_cursor.y:0.4f}"
 
         return d, saved_cursor
+
+    def advance(self, cursor):
+        if len(self.stack) == 0:
+            raise Exception("PopPosition without corresponding PushPosition found")
+
+        saved_cursor = self.stack.pop()
+        cursor.x = saved_cursor.x
+        cursor.y = saved_cursor.y
+        cursor.dir = saved_cursor.dir
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from .geometry import Geometry, MOVE, ARC
+from .raster import rasterize
+from .simplify import simplify
+from .storage import write_json
+
+INDEX_FILENAME = "index.json"
+
+
+# writes the geometry as a pyramid of square tiles (a quadtree) into directory, tile (level, x, y) goes to
+# level/x/y.svg (or .png). level 0 is one tile showing the whole curve (the part of the plane of the turtle's svg,
+# made square), every tile of level k is split into 4 tiles of level k+1 as long as it holds more than max_segments
+# segments of the geometry (and level < max_level). the geometry of every tile is simplified to what can be seen at its
+# resolution, coarser if needed to stay within max_segments.
+# index.json describes every tile (bounds, segment counts, file). a tile whose content did not change since the last
+# export into directory is not written again, tiles that are gone are removed. returns the index
+def export_tiles(turtle, geometry: Geometry, directory: str, max_segments=10000, max_level=10, tile_size=256,
+                 image_format="svg", precision=4, antialias=4) -> dict:
+    if image_format not in ("svg", "png"):
+        raise ValueError(f"tiles can be written as svg or png, not {image_format}")
+    if max_segments < 2:
+        raise ValueError(f"a tile needs room for at least 2 segments (a move and a line), not {max_segments}")
+    root_x, root_y, root_size = _root_square(turtle, geometry.bbox)
+    boxes = _segment_boxes(geometry)
+    arc_rank = np.cumsum(geometry.commands == ARC) - 1
+    previous = {(t["level"], t["x"], t["y"]): t for t in _read_index(directory).get("tiles", [])}
+
+    tiles = []
+    # (level, x, y, drawn segments that may be in the tile)
+    pending = [(0, 0, 0, np.flatnonzero(geometry.commands != MOVE))]
+    while pending:
+        level, x, y, segments = pending.pop()
+        size = root_size / 2 ** level
+        bounds = (root_x + x * size, root_y + y * size, size, size)
+        segments = segments[_overlaps(boxes[segments], bounds, turtle.stroke / 2)]
+        if len(segments) == 0:
+            continue
+        tile_geometry, tolerance = _tile_geometry(_select(geometry, segments, arc_rank), size / tile_size, size,
+                                                  max_segments)
+        leaf = len(segments) <= max_segments or level >= max_level
+        tile = {"level": level, "x": x, "y": y, "bounds": list(bounds), "source_segments": int(len(segments)),
+                "segments": len(tile_geometry), "tolerance": tolerance, "leaf": leaf,
+                "file": os.path.join(str(level), str(x), f"{y}.{image_format}")}
+        tile["digest"] = _digest(tile_geometry, tile, turtle.stroke, tile_size, precision, antialias)
+        path = os.path.join(directory, tile["file"])
+        before = previous.get((level, x, y))
+        if before is None or before.get("digest") != tile["digest"] or not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_tile(turtle, tile_geometry, path, bounds, tile_size, image_format, precision, antialias)
+        tiles.append(tile)
+        if not leaf:
+            pending.extend((level + 1, 2 * x + i, 2 * y + j, segments) for j in (1, 0) for i in (1, 0))
+
+    tiles.sort(key=lambda t: (t["level"], t["x"], t["y"]))
+    current = {t["file"] for t in tiles}
+    for tile in previous.values():
+        path = os.path.join(directory, tile["file"])
+        if tile["file"] not in current and os.path.exists(path):
+            os.remove(path)
+            # level/x/ and then level/ once they are empty
+            for parent in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+                if not os.listdir(parent):
+                    os.rmdir(parent)
+
+    index = {"bounds": [root_x, root_y, root_size, root_size], "tile_size": tile_size, "format": image_format,
+             "max_segments": max_segments, "levels": max((t["level"] for t in tiles), default=0) + 1,
+             "tiles": tiles}
+    write_json(os.path.join(directory, INDEX_FILENAME), index)
+    return index
+
+
+# square (x, y, size) around the part of the plane shown by the svg of the turtle
+def _root_square(turtle, bbox) -> tuple:
+    x, y, width, height = turtle._viewbox_rect(bbox)
+    size = max(width, height)
+    return x - (size - width) / 2, y - (size - height) / 2, size
+
+
+# (xmin, ymin, xmax, ymax) of every segment. an arc stays within twice its radius of its start
+def _segment_boxes(geometry: Geometry) -> np.ndarray:
+    start, end = geometry.vertices[:-1], geometry.vertices[1:]
+    boxes = np.concatenate((np.minimum(start, end), np.maximum(start, end)), axis=1)
+    is_arc = geometry.commands == ARC
+    if np.any(is_arc):
+        chord = np.hypot(*(end[is_arc] - start[is_arc]).T)
+        margin = 2 * np.maximum(np.abs(geometry.arcs[:, :2]).max(axis=1), chord / 2)
+        boxes[is_arc, :2] -= margin[:, None]
+        boxes[is_arc, 2:] += margin[:, None]
+    return boxes
+
+
+def _overlaps(boxes: np.ndarray, bounds: tuple, margin: float) -> np.ndarray:
+    x, y, width, height = bounds
+    return (boxes[:, 0] <= x + width + margin) & (boxes[:, 2] >= x - margin) & \
+        (boxes[:, 1] <= y + height + margin) & (boxes[:, 3] >= y - margin)
+
+
+# the given (sorted) segments of the geometry, a move leads to the start of every run of consecutive segments. no
+# segments give an empty geometry (an empty tile)
+def _select(geometry: Geometry, segments: np.ndarray, arc_rank: np.ndarray) -> Geometry:
+    if len(segments) == 0:
+        return Geometry(np.zeros((1, 2)), np.empty(0, dtype=geometry.commands.dtype), np.empty((0, 5)),
+                        (0.0, 0.0, 0.0, 0.0))
+    run_start = np.ones(len(segments), dtype=bool)
+    run_start[1:] = segments[1:] != segments[:-1] + 1
+    # one entry for the end of every segment, one more for the start of every run
+    position = np.cumsum(1 + run_start) - 1
+    vertices = np.empty((position[-1] + 1, 2))
+    commands = np.empty(position[-1] + 1, dtype=geometry.commands.dtype)
+    vertices[position] = geometry.vertices[segments + 1]
+    commands[position] = geometry.commands[segments]
+    vertices[position[run_start] - 1] = geometry.vertices[segments[run_start]]
+    commands[position[run_start] - 1] = MOVE
+    arcs = geometry.arcs[arc_rank[segments[geometry.commands[segments] == ARC]]]
+    # the first move is where the tile's path starts
+    return Geometry(vertices, commands[1:], arcs, (*vertices.min(axis=0), *vertices.max(axis=0)))
+
+
+# the geometry simplified by half a pixel, or as much more as it takes to get down to max_segments. what is still
+# too much after simplifying by a whole tile is cut down to the longest segments. returns the tolerance used
+def _tile_geometry(geometry: Geometry, pixel: float, size: float, max_segments: int) -> tuple:
+    tolerance = pixel / 2
+    simplified, _ = simplify(geometry, tolerance=tolerance)
+    while len(simplified) > max_segments and tolerance < size:
+        tolerance *= 2
+        simplified, _ = simplify(geometry, tolerance=tolerance)
+    if len(simplified) > max_segments:
+        drawn = np.flatnonzero(simplified.commands != MOVE)
+        delta = np.diff(simplified.vertices, axis=0)[drawn]
+        # every kept segment may need a move, so only half of the budget
+        longest = np.sort(drawn[np.argsort(-np.hypot(delta[:, 0], delta[:, 1]), kind="stable")[:max_segments // 2]])
+        simplified = _select(simplified, longest, np.cumsum(simplified.commands == ARC) - 1)
+    return simplified, tolerance
+
+
+def _write_tile(turtle, geometry: Geometry, path: str, bounds: tuple, tile_size: int, image_format: str, precision,
+                antialias):
+    if image_format == "svg":
+        turtle.writeGeometrySvgView(geometry, path + ".tmp", bounds, (tile_size, tile_size), precision=precision)
+    else:
+        image = rasterize(geometry, (tile_size, tile_size), bounds, stroke=turtle.stroke, antialias=antialias)
+        image.save(path + ".tmp", format="PNG")
+    os.replace(path + ".tmp", path)
+
+
+# changes whenever the tile would look different
+def _digest(geometry: Geometry, tile: dict, stroke, tile_size: int, precision: int, antialias: int) -> str:
+    digest = hashlib.sha256()
+    for array in (geometry.vertices, geometry.commands, geometry.arcs):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(json.dumps([tile["bounds"], tile["file"], stroke, tile_size, precision, antialias]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_index(directory: str) -> dict:
+    path = os.path.join(directory, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -1,61 +1,172 @@
+import os
+from itertools import chain
+import numpy as np
 import svgwrite
-from .svg import Cursor, Line, Rotation, Arc, PushPosition, PopPosition
+from .svg import Line, Rotation, Arc, PushPosition, PopPosition
+from .geometry import Geometry, MovementTable, iter_geometry, join_geometry, to_geometry, trace, union_bbox
+from .raster import rasterize
+from .simplify import simplify
+from .writer import PathDataWriter
 
 
 class SVGTurtle:
-    def __init__(self, movement_map, width=600, height=400, stroke=3, start_direction=0) -> None:
+    # simplify_tolerance turns on the simplification of the geometry (see simplify.simplify), 0 only removes segments
+    # that do not change the drawing. removed_segments counts what was removed since the turtle was created
+    def __init__(self, movement_map, width=600, height=400, stroke=3, start_direction=0,
+                 simplify_tolerance=None) -> None:
         self.movement_map = movement_map
         self.stroke = stroke
         self.width = width
         self.height = height
         self.start_direction = -start_direction  # negative, because svg y axis goes down
+        self.simplify_tolerance = simplify_tolerance
+        self.removed_segments = 0
 
-    def _to_drawing(self, sequence):
-        path = svgwrite.path.Path(fill="none")
+    # a sequence that is neither a string nor an array of codes (e.g. the lazy one of Curve.run) is traced chunk by
+    # chunk, without joining it into one string
+    def geometry(self, sequence) -> Geometry:
+        if isinstance(sequence, (str, np.ndarray)):
+            return self._simplify(to_geometry(sequence, self.movement_map, start_direction=self.start_direction))
+        chunks = list(iter_geometry(sequence, self.movement_map, start_direction=self.start_direction))
+        if not chunks:
+            return self.geometry("")
+        return self._simplify(join_geometry(chunks))
+
+    def _simplify(self, geometry: Geometry) -> Geometry:
+        if self.simplify_tolerance is None:
+            return geometry
+        geometry, removed = simplify(geometry, tolerance=self.simplify_tolerance)
+        self.removed_segments += removed
+        return geometry
+
+    def _to_drawing(self, geometry: Geometry):
+        path = svgwrite.path.Path(d=geometry.path_data(), fill="none")
         path.stroke(color="black", width=self.stroke,
                     linecap="round", linejoin="round")
 
-        xmin = 0
-        xmax = 0
-        ymin = 0
-        ymax = 0
-        cursor = Cursor(x=0, y=0, dir=self.start_direction)
-        path.push("M 0 0")
-
-        for char in sequence:
-            if char not in self.movement_map:
-                raise Exception(f"{char} not defined in movement map")
-
-            movement = self.movement_map[char]
-            segment, cursor = movement.generate(start_cursor=cursor)
-            path.push(segment)
-            xmin = min(xmin, cursor.x)
-            xmax = max(xmax, cursor.x)
-            ymin = min(ymin, cursor.y)
-            ymax = max(ymax, cursor.y)
+        svg = svgwrite.Drawing(
+            size=(self.width, self.height),
+            viewBox=self._viewbox(geometry.bbox)
+        )
+        svg.add(path)
+        return svg
+
+    def _viewbox(self, bbox) -> str:
+        return "{} {} {} {}".format(*self._viewbox_rect(bbox))
 
+    def _viewbox_rect(self, bbox) -> tuple:
+        xmin, ymin, xmax, ymax = bbox
         # add some margin around the path
         viewboxWidth = xmax-xmin+self.width*0.2
         viewboxHeight = ymax-ymin+self.height*0.2
         viewboxX = xmin-self.width*0.1
         viewboxY = ymin-self.height*0.1
-        viewbox = f"{viewboxX} {viewboxY} {viewboxWidth} {viewboxHeight}"
-        svg = svgwrite.Drawing(
-            size=(self.width, self.height),
-            viewBox=viewbox
-        )
-        svg.add(path)
-        return svg
+        return viewboxX, viewboxY, viewboxWidth, viewboxHeight
+
+    # vectorized interpreter: all vertices as (N,2) array plus a pen-up flag per vertex
+    def to_arrays(self, sequence):
+        return trace(sequence, self.movement_map, start_direction=self.start_direction)
 
     def asSvgString(self, sequence, writeToFilename=None):
-        svg = self._to_drawing(sequence)
+        return self.geometryAsSvgString(self.geometry(sequence), writeToFilename=writeToFilename)
+
+    def geometryAsSvgString(self, geometry: Geometry, writeToFilename=None):
+        svg = self._to_drawing(geometry)
         if writeToFilename is not None:
             svg.saveas(writeToFilename)
         return svg.tostring()
 
+    # writes an svg string of geometryAsSvgString into a file, the same way writeToFilename does
+    def saveSvgString(self, svg: str, filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+            f.write(svg)
+
+    # the sequence as uint8 codes of the movement map (the positions of the symbols in sorted(movement_map)), which
+    # can be passed instead of the sequence everywhere
+    def encode(self, sequence) -> np.ndarray:
+        return MovementTable(self.movement_map).encode(sequence)
+
+    # draws the curve straight into a grayscale PIL image of the given size (by default the size of the svg), showing
+    # the same part of the plane as the svg. antialias=1 turns antialiasing off
+    def asImage(self, sequence, size=None, antialias=4):
+        return self.geometryAsImage(self.geometry(sequence), size=size, antialias=antialias)
+
+    def geometryAsImage(self, geometry: Geometry, size=None, antialias=4):
+        size = (self.width, self.height) if size is None else size
+        return rasterize(geometry, size, self._viewbox_rect(geometry.bbox), stroke=self.stroke, antialias=antialias)
+
+    # fast alternative to asSvgString for large curves: writes the svg document straight into out (a filename or a
+    # text stream like io.StringIO), bypassing svgwrite. returns the number of characters of the path data
+    def writeSvg(self, sequence, out, precision=4, relative=False) -> int:
+        return self.writeGeometrySvg(self.geometry(sequence), out, precision=precision, relative=relative)
+
+    def writeGeometrySvg(self, geometry: Geometry, out, precision=4, relative=False) -> int:
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "w", encoding="utf-8") as f:
+                return self.writeGeometrySvg(geometry, f, precision=precision, relative=relative)
+
+        out.write(self._svg_header(geometry.bbox))
+        writer = PathDataWriter(out, precision=precision, relative=relative)
+        writer.write(geometry)
+        writer.close()
+        out.write(self._svg_footer())
+        return writer.characters_written
+
+    # two-pass rendering for curves whose svg does not fit into memory. symbols is a function returning a fresh (lazy)
+    # iterable of the sequence on every call. the first pass only computes the bounding box (skipped if bbox is
+    # given), the second pass writes the path chunk by chunk
+    def streamSvg(self, symbols, out, bbox=None, precision=4, relative=False, chunk_size=1 << 16) -> int:
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "w", encoding="utf-8") as f:
+                return self.streamSvg(symbols, f, bbox=bbox, precision=precision, relative=relative,
+                                      chunk_size=chunk_size)
+
+        if bbox is None:
+            bbox = union_bbox(chain([(0, 0, 0, 0)], (g.bbox for g in self._iter_geometry(symbols(), chunk_size))))
+        out.write(self._svg_header(bbox))
+        writer = PathDataWriter(out, precision=precision, relative=relative)
+        for geometry in self._iter_geometry(symbols(), chunk_size):
+            writer.write(geometry)
+        writer.close()
+        out.write(self._svg_footer())
+        return writer.characters_written
+
+    def _iter_geometry(self, symbols, chunk_size):
+        for geometry in iter_geometry(symbols, self.movement_map, start_direction=self.start_direction,
+                                      chunk_size=chunk_size):
+            yield self._simplify(geometry)
+
+    # writes the part viewbox = (x, y, width, height) of the plane into an svg of the given size (width, height) in
+    # pixels, e.g. a tile of a larger curve (see tiles.py)
+    def writeGeometrySvgView(self, geometry: Geometry, out, viewbox: tuple, size: tuple, precision=4) -> int:
+        if isinstance(out, (str, os.PathLike)):
+            with open(out, "w", encoding="utf-8") as f:
+                return self.writeGeometrySvgView(geometry, f, viewbox, size, precision=precision)
+
+        out.write(self._svg_open(size, "{} {} {} {}".format(*viewbox)))
+        writer = PathDataWriter(out, precision=precision)
+        writer.write(geometry)
+        writer.close()
+        out.write(self._svg_footer())
+        return writer.characters_written
+
+    def _svg_header(self, bbox) -> str:
+        return self._svg_open((self.width, self.height), self._viewbox(bbox))
+
+    def _svg_open(self, size: tuple, viewbox: str) -> str:
+        return '<?xml version="1.0" encoding="utf-8" ?>\n' \
+            f'<svg baseProfile="full" height="{size[1]}" version="1.1" viewBox="{viewbox}" ' \
+            f'width="{size[0]}" xmlns="http://www.w3.org/2000/svg" xmlns:ev="http://www.w3.org/2001/xml-events" ' \
+            'xmlns:xlink="http://www.w3.org/1999/xlink"><defs /><path d="'
+
+    def _svg_footer(self) -> str:
+        return '" fill="none" stroke="black" stroke-linecap="round" stroke-linejoin="round" ' \
+            f'stroke-width="{self.stroke}" /></svg>'
+
 
 class SimpleTurtle(SVGTurtle):
-    def __init__(self, angle, stride, size, width=3, start_direction=0):
+    def __init__(self, angle, stride, size, width=3, start_direction=0, simplify_tolerance=None):
         stack = []
         movement_map = {
             "O": Line(length=stride, draw=False),
@@ -69,4 +180,5 @@ class SimpleTurtle(SVGTurtle):
             "[": PushPosition(stack=stack),
             "]": PopPosition(stack=stack)
         }
-        super().__init__(movement_map, width=size, height=size, stroke=width, start_direction=start_direction)
+        super().__init__(movement_map, width=size, height=size, stroke=width, start_direction=start_direction,
+                         simplify_tolerance=simplify_tolerance)
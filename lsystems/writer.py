@@ -0,0 +1,103 @@
+import re
+import numpy as np
+
+from .geometry import Geometry, LINE, MOVE, ARC
+
+_LETTERS = {LINE: "L", MOVE: "M", ARC: "A"}
+_TRAILING_ZEROS = re.compile(r"\.0+\b|(\.\d*?[1-9])0+\b")
+
+
+class PathDataWriter:
+    # writes the "d" attribute of an svg path for one or several consecutive geometries straight into a text stream,
+    # chunk by chunk. zero-length lines and moves as well as moves directly followed by another move are skipped,
+    # runs of the same command are written as one (i.e. "L 1 2 3 4" instead of "L 1 2 L 3 4").
+    def __init__(self, out, precision=4, relative=False, chunk_size=1 << 16):
+        self.out = out
+        self.precision = precision
+        self.relative = relative
+        self.chunk_size = chunk_size
+        self.characters_written = 0
+        self._previous = None  # rounded end point of the last segment seen
+        self._current = np.zeros(2)  # rounded end point of the last segment written
+        self._pending_move = None
+        self._last_command = None
+
+    def write(self, geometry: Geometry):
+        arc_offset = 0
+        for start in range(0, max(len(geometry), 1), self.chunk_size):
+            commands = geometry.commands[start:start + self.chunk_size]
+            vertices = self._round(geometry.vertices[start:start + len(commands) + 1])
+            number_of_arcs = int(np.count_nonzero(commands == ARC))
+            arcs = geometry.arcs[arc_offset:arc_offset + number_of_arcs]
+            arc_offset += number_of_arcs
+            self._write_chunk(commands, vertices, arcs)
+
+    def close(self):
+        # a trailing move does not draw anything
+        self._pending_move = None
+
+    def _round(self, values):
+        # adding 0.0 turns -0.0 into 0.0
+        return np.round(values, self.precision) + 0.0
+
+    def _write_chunk(self, commands, vertices, arcs):
+        if self._previous is None:
+            # the path always starts with a move to its first vertex
+            self._pending_move = vertices[0]
+        elif not np.array_equal(self._previous, vertices[0]):
+            raise ValueError("geometry does not continue where the previous one ended")
+        self._previous = vertices[-1]
+
+        keep = (commands == ARC) | np.any(vertices[1:] != vertices[:-1], axis=1)
+        commands = commands[keep]
+        points = vertices[1:][keep]
+        if self._pending_move is not None:
+            commands = np.concatenate(([MOVE], commands)).astype(np.uint8)
+            points = np.concatenate((self._pending_move[None, :], points))
+        keep = np.ones(len(commands), dtype=bool)
+        keep[:-1] = (commands[:-1] != MOVE) | (commands[1:] != MOVE)
+        commands = commands[keep]
+        points = points[keep]
+        self._pending_move = None
+        if len(commands) > 0 and commands[-1] == MOVE:
+            self._pending_move = points[-1]
+            commands = commands[:-1]
+            points = points[:-1]
+        if len(commands) == 0:
+            return
+
+        # rx, ry, rotation, large_arc, sweep, x, y for every command, only x, y are written for lines and moves
+        values = np.zeros((len(commands), 7))
+        is_arc = commands == ARC
+        values[is_arc, :5] = arcs
+        values[:, :3] = self._round(values[:, :3])
+        if self.relative:
+            values[:, 5:] = self._round(np.diff(np.concatenate((self._current[None, :], points)), axis=0))
+        else:
+            values[:, 5:] = points
+        self._current = points[-1]
+        used = np.zeros((len(commands), 7), dtype=bool)
+        used[:, 5:] = True
+        used[is_arc] = True
+
+        repeated = np.empty(len(commands), dtype=bool)
+        repeated[0] = commands[0] == self._last_command
+        repeated[1:] = commands[1:] == commands[:-1]
+        repeated &= commands != MOVE
+        self._last_command = commands[-1]
+
+        number = f"%.{self.precision}f"
+        templates = {}
+        for command in (LINE, MOVE, ARC):
+            letter = _LETTERS[command].lower() if self.relative else _LETTERS[command]
+            arguments = " ".join([number] * 3 + ["%d"] * 2 + [number] * 2) if command == ARC else f"{number} {number}"
+            templates[command, False] = letter + arguments
+            templates[command, True] = arguments
+        template = " ".join([templates[c, r] for c, r in zip(commands.tolist(), repeated.tolist())])
+        text = template % tuple(values[used].tolist())
+        if self.precision > 0:
+            text = _TRAILING_ZEROS.sub(r"\1", text)
+        if self.characters_written > 0:
+            text = " " + text
+        self.out.write(text)
+        self.characters_written += len(text)
@@ -0,0 +1,28 @@
+import unittest
+from benchmarks.bench_suite import regressions
+
+
+def record(curve, depth, mode, seconds, peak_bytes=1000, output_bytes=500):
+    return {"curve": curve, "depth": depth, "mode": mode, "seconds": seconds, "peak_bytes": peak_bytes,
+            "output_bytes": output_bytes}
+
+
+class TestBenchSuite(unittest.TestCase):
+    def test_regressions(self):
+        baseline = [record("Dragon", 8, "straight", 1.0), record("Dragon", 8, "curved", 1.0),
+                    record("Hilbert", 3, "straight", 1.0, peak_bytes=1000)]
+        results = [
+            record("Dragon", 8, "straight", 1.1),  # within the threshold
+            record("Dragon", 8, "curved", 1.5, output_bytes=400),  # slower, smaller
+            record("Hilbert", 3, "straight", 0.5, peak_bytes=2000),  # faster, needs more memory
+            record("Hilbert", 5, "straight", 9.0),  # not in the baseline
+        ]
+        self.assertEqual(regressions(results, baseline, 0.2), [(("Dragon", 8, "curved"), "seconds", 1.0, 1.5),
+                                                               (("Hilbert", 3, "straight"), "peak_bytes", 1000, 2000)])
+        self.assertEqual(regressions(results, baseline, 1.0), [])
+        self.assertEqual(len(regressions(results, baseline, 0.05)), 3)
+        self.assertEqual(regressions(results, [], 0.2), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from lsystems import curves
+from lsystems.cache import RenderCache
+from lsystems.svg import Cursor, Movement
+
+
+# a movement without slots
+class Jump(Movement):
+    def __init__(self, length):
+        self.length = length
+        self._calls = 0
+
+    def generate(self, start_cursor):
+        self._calls += 1
+        end_cursor = Cursor(x=start_cursor.x + self.length, y=start_cursor.y, dir=start_cursor.dir)
+        return f"M {end_cursor.x:0.4f} {end_cursor.y:0.4f}", end_cursor
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = RenderCache(self.directory.name)
+
+    def test_key(self):
+        key = RenderCache.key(curves.Dragon(), 'svg', 5)
+        self.assertEqual(RenderCache.key(curves.Dragon(), 'svg', 5), key)
+        self.assertNotEqual(RenderCache.key(curves.Dragon(width=4), 'svg', 5), key)
+        self.assertNotEqual(RenderCache.key(curves.Dragon(), 'svg', 6), key)
+        self.assertNotEqual(RenderCache.key(curves.Hilbert(), 'svg', 5), key)
+
+    def test_key_of_movement_without_slots(self):
+        keys = []
+        for jump in [Jump(5), Jump(10), Jump(5)]:
+            curve = curves.Dragon()
+            curve.turtle.movement_map['J'] = jump
+            jump.generate(Cursor(x=0, y=0, dir=0))
+            keys.append(RenderCache.key(curve, 'svg', 5))
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], keys[2])
+
+    def test_run(self):
+        for curve in [curves.Hilbert(), curves.Hendragon2()]:
+            for curved in [False, True]:
+                run = curve.run_curved if curved else curve.run
+                expected = run(3)
+                vertices = curve.turtle.geometry(curve._sequence(3, '', curved, False)).vertices
+                self.assertEqual(run(3, cache=self.cache), expected)
+                hits = self.cache.hits
+                # the second run is served from the cache without expanding anything
+                with mock.patch.object(curve.lsys, 'run_from', side_effect=AssertionError):
+                    self.assertEqual(run(3, cache=self.cache), expected)
+                    np.testing.assert_array_equal(curve.run_geometry(3, curved=curved, cache=self.cache).vertices,
+                                                  vertices)
+                self.assertEqual(self.cache.hits, hits + 2)
+
+    def test_start_string_with_symbols_of_its_own(self):
+        c = curves.Dragon()
+        self.assertEqual(c.run(4, init_str='FX+F', cache=self.cache), c.run(4, init_str='FX+F'))
+        self.assertEqual(c.run(4, init_str='FX+F', cache=self.cache), c.run(4, init_str='FX+F'))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_generations_and_images(self):
+        c = curves.Dragon()
+        images = [generation.image(size=(40, 40)) for generation in c.run_generations(3, cache=self.cache)]
+        for iters, image in enumerate(images):
+            cached = c.run_image(iters, size=(40, 40), cache=self.cache)
+            np.testing.assert_array_equal(np.asarray(cached), np.asarray(image))
+        self.assertEqual(self.cache.stats()['hits'], 4)
+
+    def test_eviction(self):
+        c = curves.Dragon()
+        for iters in range(4):
+            c.run(iters, cache=self.cache)
+        size = self.cache.stats()['bytes']
+        self.cache.max_bytes = size // 2
+        self.cache.evict()
+        stats = self.cache.stats()
+        self.assertLessEqual(stats['bytes'], size // 2)
+        self.assertGreater(stats['entries'], 0)
+        # the most recently used entries are kept
+        key = RenderCache.key(c, 'svg', 3, c.lsys.start_symbol, False, {'resolution': None})
+        self.assertTrue(os.path.exists(self.cache.path(key, 'svg')))
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_put_only_scans_when_over_budget(self):
+        self.cache.put(RenderCache.key('first'), 'svg', 'x' * 100)
+        with mock.patch.object(self.cache, '_entries', wraps=self.cache._entries) as entries:
+            for i in range(10):
+                self.cache.put(RenderCache.key(i), 'svg', 'x' * 100)
+            # overwriting an entry does not change the size
+            self.cache.put(RenderCache.key(0), 'svg', 'x' * 100)
+            self.assertEqual(entries.call_count, 0)
+            self.cache.max_bytes = 500
+            self.cache.put(RenderCache.key('last'), 'svg', 'x' * 100)
+            self.assertEqual(entries.call_count, 1)
+        self.assertEqual(self.cache.stats()['bytes'], 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,39 @@ class TestCurves(unittest.TestCase):
         curved_str = 'X))())((X'
         self.assertEqual(result, curved_str)
 
+    def test_analytic_statistics(self):
+        for curve_class in [curves.Sierpinski, curves.Dragon, curves.Hilbert, curves.Hendragon, curves.FractalPlant]:
+            c = curve_class()
+            geometry = c.run_geometry(3)
+            self.assertEqual(c.segment_count(3), len(geometry))
+            self.assertEqual(c.sequence_length(3, init_str='F+F'), len(c._output_pipeline.apply(c.run_str(3, 'F+F'))))
+            for predicted, actual in zip(c.extent(3), geometry.bbox):
+                self.assertAlmostEqual(predicted, actual)
+        with self.assertRaises(ValueError):
+            curves.Hendragon2().extent(3)
+
+    def test_lazy_matches_eager(self):
+        for curve_class in [curves.Sierpinski, curves.Dragon, curves.Hilbert, curves.FractalPeano,
+                            curves.Hendragon, curves.Hendragon2, curves.FractalPlant]:
+            c = curve_class()
+            for iters in range(3):
+                self.assertEqual(''.join(c.iter_str(iters)), c.run_str(iters))
+                self.assertEqual(''.join(c.iter_curved_str(iters)), c.run_curved_str(iters))
+            self.assertEqual(c.run(2, lazy=True), c.run(2))
+            self.assertEqual(c.run_curved(2, lazy=True), c.run_curved(2))
+
+    def test_run_generations(self):
+        for curve_class in [curves.Dragon, curves.Hendragon, curves.Hendragon2, curves.FractalPlant]:
+            c = curve_class()
+            for curved in [False, True]:
+                generations = list(c.run_generations(3, init_str=c.lsys.start_symbol * 2, curved=curved))
+                self.assertEqual([g.iters for g in generations], [0, 1, 2, 3])
+                for g in generations:
+                    if curved:
+                        self.assertEqual(g.svg, c.run_curved(g.iters, init_str=c.lsys.start_symbol * 2))
+                    else:
+                        self.assertEqual(g.svg, c.run(g.iters, init_str=c.lsys.start_symbol * 2))
+
 
 if __name__ == '__main__':
     unittest.main()
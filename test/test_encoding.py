@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from lsystems import curves
+from lsystems.encoding import Alphabet, Substitution
+from lsystems.geometry import MovementTable
+
+
+class TestEncoding(unittest.TestCase):
+    def test_alphabet(self):
+        alphabet = Alphabet('F+-[]X')
+        codes = alphabet.encode('XF+[F]-X')
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertEqual(len(codes), 8)
+        self.assertEqual(alphabet.decode(codes), 'XF+[F]-X')
+        with self.assertRaisesRegex(Exception, 'Y not defined'):
+            alphabet.encode('FYF')
+        # symbols beyond latin-1 still take one byte
+        alphabet = Alphabet('aβ→')
+        self.assertEqual(alphabet.decode(alphabet.encode('→aβa')), '→aβa')
+
+    def test_substitution(self):
+        alphabet = Alphabet('ab')
+        substitution = Substitution([alphabet.encode('ab'), alphabet.encode('')], chunk_size=3)
+        codes = alphabet.encode('abaab')
+        self.assertEqual(alphabet.decode(substitution.apply(codes)), 'ababab')
+
+    def test_run_encoded(self):
+        for curve_class in [curves.Sierpinski, curves.Dragon, curves.Hilbert, curves.FractalPeano,
+                            curves.Hendragon, curves.Hendragon2, curves.FractalPlant]:
+            c = curve_class()
+            chars = MovementTable(c.turtle.movement_map).chars
+            for iters in range(4):
+                self.assertEqual(c.lsys.alphabet.decode(c.lsys.run_encoded(iters)), c.lsys.run(iters))
+                for curved in [False, True]:
+                    codes = c.run_encoded(iters, curved=curved)
+                    self.assertEqual(codes.dtype, np.uint8)
+                    self.assertEqual(''.join(chars[i] for i in codes), c._sequence(iters, '', curved, lazy=False))
+            geometry = c.run_geometry(3, curved=True)
+            np.testing.assert_array_equal(c.run_geometry(3, curved=True, encoded=True).vertices, geometry.vertices)
+
+    def test_start_string_with_symbols_of_its_own(self):
+        for c, init_str in [(curves.Dragon(), 'FX+F'), (curves.Sierpinski(), 'AX'), (curves.Hendragon(), 'MF+')]:
+            lsys = c.lsys
+            self.assertEqual(lsys.alphabet_for(init_str).decode(lsys.run_encoded(3, init_str=init_str)),
+                             lsys.run(3, init_str=init_str))
+            np.testing.assert_array_equal(c.run_geometry(3, init_str=init_str, encoded=True).vertices,
+                                          c.run_geometry(3, init_str=init_str).vertices)
+
+
+if __name__ == '__main__':
+    unittest.main()
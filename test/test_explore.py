@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from lsystems import curves, explore
+
+
+class TestExplore(unittest.TestCase):
+    def test_statistics_match_the_rendered_curve(self):
+        for curve_class in [curves.Dragon, curves.Hilbert, curves.FractalPlant]:
+            c = curve_class()
+            candidates = explore.explore(c, count=300, length=6, iters=3, seed=1)
+            self.assertGreater(len(candidates), 0)
+            for candidate in candidates[:20]:
+                geometry = c.run_geometry(3, init_str=candidate.start_string)
+                self.assertEqual(candidate.segments, len(geometry))
+                np.testing.assert_allclose(candidate.extent, geometry.bbox, atol=1e-9)
+                np.testing.assert_allclose(candidate.displacement, geometry.vertices[-1] - geometry.vertices[0],
+                                           atol=1e-9)
+
+    def test_equivalent_start_strings_are_dropped(self):
+        c = curves.Hilbert()
+        candidates = explore.explore(c, count=500, length=4, iters=2, seed=3, min_segments=0)
+        start_strings = explore.random_start_strings(c, 500, 4, seed=3)
+        self.assertLess(len(candidates), len(set(start_strings)))
+        # no curve (with an area) gets lost
+        svgs = {c.run(2, init_str=candidate.start_string) for candidate in candidates}
+        for start_string in start_strings:
+            bbox = c.run_geometry(2, init_str=start_string).bbox
+            if bbox[2] > bbox[0] and bbox[3] > bbox[1]:
+                self.assertIn(c.run(2, init_str=start_string), svgs)
+        tables = explore._SymbolTables(c, 2)
+        # trailing turns and the symbols drawn as nothing at depth 0 do not change anything
+        codes = np.array([[explore.start_symbols(c).index(s) for s in string]
+                          for string in ['F+F++', 'F+F-+', 'AF+BF', 'F+FAB']])
+        keys = tables.canonical_codes(codes)
+        np.testing.assert_array_equal(keys[0], keys[1])
+        self.assertFalse(np.array_equal(keys[0], keys[2]))
+        keys = explore._SymbolTables(c, 0).canonical_codes(codes)
+        np.testing.assert_array_equal(keys[2], keys[3])
+        np.testing.assert_array_equal(keys[0], keys[2])
+
+    def test_filters(self):
+        c = curves.Dragon()
+        candidates = explore.explore(c, count=500, length=5, iters=4, seed=7, min_segments=40, max_segments=60,
+                                     accept=lambda candidate: candidate.width >= candidate.height, limit=10)
+        self.assertLessEqual(len(candidates), 10)
+        for candidate in candidates:
+            self.assertTrue(40 <= candidate.segments <= 60)
+            self.assertGreaterEqual(candidate.width, candidate.height)
+            self.assertGreater(candidate.height, 0)
+        # curves that can not be analysed only lose duplicates
+        candidates = explore.explore(curves.Hendragon2(), count=100, length=2, iters=2, seed=7)
+        self.assertEqual(len({candidate.start_string for candidate in candidates}), len(candidates))
+        self.assertIsNone(candidates[0].segments)
+
+    def test_every_candidate_can_be_rendered(self):
+        for curve_class in [curves.Sierpinski, curves.Dragon, curves.Hilbert, curves.FractalPeano,
+                            curves.Hendragon, curves.Hendragon2, curves.FractalPlant]:
+            c = curve_class()
+            for candidate in explore.explore(c, count=200, length=10, iters=2, seed=11, limit=10):
+                for generation in c.run_generations(2, init_str=candidate.start_string):
+                    self.assertTrue(generation.svg.startswith('<svg'))
+                for generation in c.run_generations(2, init_str=candidate.start_string, curved=True):
+                    self.assertTrue(generation.svg.startswith('<svg'))
+
+    def test_draw_random_curve(self):
+        c = curves.Dragon()
+        self.assertEqual(curves.draw_random_curve(5, c, 4), curves.draw_random_curve(5, c, 4))
+        self.assertTrue(curves.draw_random_curve(5, c, 4).startswith('<svg'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import sys
+import unittest
+import numpy as np
+from lsystems import analysis, curves
+from lsystems.geometry import LINE, MOVE, ARC, iter_geometry, join_geometry, to_geometry, union_bbox
+from lsystems.lsystem import LSystem
+from lsystems.svg import Cursor, Line, Movement, PopPosition
+from lsystems.turtle import SimpleTurtle
+
+
+def trace_slow(turtle, sequence):
+    cursor = Cursor(x=0, y=0, dir=turtle.start_direction)
+    vertices = [(0, 0)]
+    pen_up = [True]
+    for char in sequence:
+        movement = turtle.movement_map[char]
+        segment, cursor = movement.generate(cursor)
+        if segment:
+            vertices.append((cursor.x, cursor.y))
+            pen_up.append(isinstance(movement, PopPosition) or (isinstance(movement, Line) and not movement.draw))
+    return np.array(vertices), np.array(pen_up)
+
+
+# a movement the vectorized turtle does not know: a move by a fixed offset, whatever the heading
+class Jump(Movement):
+    def __init__(self, dx, dy):
+        self.dx = dx
+        self.dy = dy
+
+    def generate(self, start_cursor):
+        end_cursor = Cursor(x=start_cursor.x + self.dx, y=start_cursor.y + self.dy, dir=start_cursor.dir)
+        return f"M {end_cursor.x:0.4f} {end_cursor.y:0.4f}", end_cursor
+
+
+class TestGeometry(unittest.TestCase):
+    def test_to_arrays_matches_movements(self):
+        for curve, sequence in [
+            (curves.Dragon(), curves.Dragon().run_curved_str(5).replace('X', 'F')),
+            (curves.FractalPlant(), 'F-F[+F[]]OF[-F[+F]-F]F(F)' + curves.FractalPlant().run_str(3).replace('X', '')),
+        ]:
+            vertices, pen_up = curve.turtle.to_arrays(sequence)
+            expected_vertices, expected_pen_up = trace_slow(curve.turtle, sequence)
+            np.testing.assert_allclose(vertices, expected_vertices, atol=1e-9)
+            np.testing.assert_array_equal(pen_up, expected_pen_up)
+
+    def test_quantized_headings(self):
+        # right angles: every vertex stays exactly on the grid
+        geometry = curves.Hilbert().run_geometry(7)
+        np.testing.assert_array_equal(geometry.vertices / 5, np.round(geometry.vertices / 5))
+        # angles that are not whole numbers fall back to trigonometry per symbol
+        turtle = SimpleTurtle(22.5, 5, 100, start_direction=10)
+        sequence = 'F+F[-F(F]F)F++F-F'
+        np.testing.assert_allclose(turtle.to_arrays(sequence)[0], trace_slow(turtle, sequence)[0], atol=1e-9)
+
+    def test_run_geometry(self):
+        d = curves.Dragon()
+        geometry = d.run_geometry(3, curved=True)  # X))())((X
+        self.assertEqual(len(geometry), 9)
+        self.assertEqual(list(geometry.commands), [LINE] + [ARC] * 7 + [LINE])
+        self.assertEqual(geometry.arcs.shape, (7, 5))
+        np.testing.assert_allclose(geometry.arcs[0], [50, 50, 0, 0, 0])
+        np.testing.assert_allclose(geometry.vertices[-1], [-200, -200], atol=1e-9)
+        np.testing.assert_allclose(geometry.bbox, [-200, -200, 100, 0], atol=1e-9)
+        self.assertIn('d="M 0 0 L 50.0000 0.0000 A 50.0000 50.0000 0 0 0 100.0000 -50.0000', d.run_curved(3))
+
+    def test_iter_geometry_chunks(self):
+        turtle = curves.FractalPlant().turtle
+        sequence = 'F[+F[-F]F]F[' + curves.FractalPlant().run_str(3).replace('X', '') + ']F'
+        geometry = to_geometry(sequence, turtle.movement_map, turtle.start_direction)
+        for chunk_size in [1, 4, 13]:
+            chunks = list(iter_geometry(sequence, turtle.movement_map, turtle.start_direction, chunk_size=chunk_size))
+            np.testing.assert_allclose(chunks[0].vertices[0], [0, 0])
+            for previous, chunk in zip(chunks, chunks[1:]):
+                np.testing.assert_array_equal(previous.vertices[-1], chunk.vertices[0])
+            np.testing.assert_allclose(np.concatenate([c.vertices[1:] for c in chunks]), geometry.vertices[1:],
+                                       atol=1e-9)
+            np.testing.assert_array_equal(np.concatenate([c.commands for c in chunks]), geometry.commands)
+            np.testing.assert_allclose(union_bbox([c.bbox for c in chunks]), geometry.bbox, atol=1e-9)
+            joined = join_geometry(chunks)
+            np.testing.assert_allclose(joined.vertices, geometry.vertices, atol=1e-9)
+            np.testing.assert_array_equal(joined.commands, geometry.commands)
+        # lazy sequences are traced in chunks
+        np.testing.assert_allclose(turtle.geometry(iter(sequence)).vertices, geometry.vertices, atol=1e-9)
+        self.assertEqual(len(turtle.geometry(iter(''))), 0)
+
+    def test_composed_geometry(self):
+        for curve, curved in [(curves.Hilbert(), False), (curves.Hendragon(), True), (curves.FractalPlant(), True),
+                              (curves.FractalPlant(), False)]:
+            for iters in [0, 1, 4]:
+                geometry = curve.run_geometry(iters, curved=curved)
+                composed = curve.run_geometry(iters, curved=curved, composed=True)
+                np.testing.assert_allclose(composed.vertices, geometry.vertices, atol=1e-9)
+                np.testing.assert_array_equal(composed.commands, geometry.commands)
+                np.testing.assert_allclose(composed.arcs, geometry.arcs, atol=1e-9)
+                np.testing.assert_allclose(composed.bbox, geometry.bbox, atol=1e-9)
+        with self.assertRaises(ValueError):
+            curves.Hendragon2().run_geometry(2, composed=True)
+
+    def test_level_of_detail(self):
+        for curve, curved in [(curves.Hilbert(), False), (curves.Hendragon(), True), (curves.FractalPlant(), False)]:
+            geometry = curve.run_geometry(5, curved=curved)
+            # every sub-curve is larger than a pixel
+            detailed = curve.run_geometry(5, curved=curved, resolution=1e9)
+            np.testing.assert_allclose(detailed.vertices, geometry.vertices, atol=1e-6)
+            np.testing.assert_array_equal(detailed.commands, geometry.commands)
+
+            coarse = curve.run_geometry(5, curved=curved, resolution=20)
+            self.assertLess(len(coarse), len(geometry))
+            pixel = max(geometry.bbox[2] - geometry.bbox[0], geometry.bbox[3] - geometry.bbox[1]) / 20
+            np.testing.assert_allclose(coarse.bbox, geometry.bbox, atol=pixel)
+        self.assertIn('<svg', curves.Hilbert().run(6, resolution=100))
+
+    def test_composed_geometry_deeper_than_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 100
+        turtle = SimpleTurtle(90, 10, 100)
+        lsys = LSystem('A -> FA;', start_symbol='A')
+        images = {'A': '+', 'F': 'F'}
+        geometry = to_geometry(lsys.run(depth).replace('A', '+'), turtle.movement_map, turtle.start_direction)
+        composed = analysis.composed_geometry(lsys, images, turtle.movement_map, turtle.start_direction, depth)
+        np.testing.assert_allclose(composed.vertices, geometry.vertices, atol=1e-6)
+        detailed = analysis.lod_geometry(lsys, images, turtle.movement_map, turtle.start_direction, depth, 1e9)
+        np.testing.assert_allclose(detailed.vertices, geometry.vertices, atol=1e-6)
+
+    def test_custom_movement(self):
+        turtle = SimpleTurtle(90, 5, 100)
+        turtle.movement_map['J'] = Jump(3, 4)
+        sequence = 'F+J[F)J]F-FJ'
+        geometry = turtle.geometry(sequence)
+        np.testing.assert_allclose(geometry.vertices, trace_slow(turtle, sequence)[0], atol=1e-9)
+        self.assertEqual(list(geometry.commands), [LINE, MOVE, LINE, ARC, MOVE, MOVE, LINE, LINE, MOVE])
+        np.testing.assert_allclose(geometry.arcs, [[5, 5, -90, 0, 0]])
+        self.assertIn('d="M 0 0 L 5.0000 0.0000 M 8.0000 4.0000 L 8.0000 -1.0000 A 5.0000 5.0000 -90 0 0',
+                      turtle.asSvgString(sequence))
+        chunks = list(iter_geometry(sequence, turtle.movement_map, turtle.start_direction, chunk_size=3))
+        np.testing.assert_allclose(np.concatenate([c.vertices[1:] for c in chunks]), geometry.vertices[1:])
+        # the analysis needs movements it can compose
+        with self.assertRaises(ValueError):
+            analysis.headings_for(turtle.movement_map, 'FJ', turtle.start_direction)
+
+    def test_unmatched_pop(self):
+        with self.assertRaises(Exception):
+            curves.FractalPlant().turtle.to_arrays('F[F]]F')
+
+    def test_unknown_symbol(self):
+        with self.assertRaisesRegex(Exception, 'X not defined'):
+            curves.FractalPlant().turtle.to_arrays('F+X')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import sys
 from lsystems import lsystem
 
 sierpinski_spec = 'A -> B - A - B; B -> A + B + A;'
@@ -21,6 +22,88 @@ class TestSvg(unittest.TestCase):
         L = lsystem.LSystem(sierpinski_spec, start_symbol='A')
         self.assertEqual(L.run_from('AA', 1), 'B-A-BB-A-B')
 
+    def test_longest_head_wins(self):
+        L = lsystem.LSystem('A -> x; AB -> y;', start_symbol='A')
+        self.assertEqual(L.run_from('ABAC', 1), 'yxC')
+        self.assertEqual(''.join(L.iter_symbols(1, init_str='ABAC')), 'yxC')
+
+    def test_pipeline_matches_sequential_stages(self):
+        stages = [{'A': '', 'B': '', '+-': '', '-+': ''}, {'FO': 'OO', 'OF': 'OO'}, {'F': 'XX', 'O': 'YY'},
+                  {'X+X': ')', 'X-X': '('}, {'X': 'F', 'Y': 'O'}]
+        pipeline = lsystem.RewritePipeline(*stages)
+        self.assertEqual(len(pipeline.plans), 3)
+
+        string = 'AF+-OFB-F+FOA-+F-OOF+BF'
+        expected = string
+        for stage in stages:
+            expected = lsystem.RewritePlan(stage).apply(expected)
+        self.assertEqual(pipeline.apply(string), expected)
+        self.assertEqual(''.join(pipeline.iter_apply(string)), expected)
+
+    def test_symbol_counts(self):
+        L = lsystem.LSystem(sierpinski_spec, start_symbol='A')
+        self.assertEqual(L.symbol_counts(2), {'A': 5, 'B': 4, '+': 4, '-': 4})
+        self.assertEqual(L.length(7, init_str='AB'), len(L.run(7, init_str='AB')))
+        with self.assertRaises(ValueError):
+            L.run(10, max_length=1000)
+        with self.assertRaises(ValueError):
+            lsystem.LSystem('A -> x; AB -> y;', start_symbol='A').symbol_counts(1)
+
+    def test_expansion_cache(self):
+        cache = lsystem.ExpansionCache()
+        L = lsystem.LSystem(sierpinski_spec, start_symbol='A', cache=cache)
+        self.assertEqual(L.run(3), 'B-A-B+A+B+A+B-A-B-A+B+A-B-A-B-A+B+A-B-A-B+A+B+A+B-A-B')
+
+        # another l-system with the same rules reuses the expansions of the first one
+        hits = cache.hits
+        self.assertEqual(lsystem.LSystem(sierpinski_spec, start_symbol='A', cache=cache).run(4), L.run(4))
+        self.assertGreater(cache.hits, hits)
+        self.assertEqual(lsystem.LSystem('A -> A-A; B -> B;', start_symbol='A', cache=cache).run(1), 'A-A')
+
+    def test_expansion_cache_eviction(self):
+        cache = lsystem.ExpansionCache(max_bytes=200)
+        for i in range(20):
+            cache.put(i, 'x' * i)
+            self.assertLessEqual(cache.size, 200)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get(19), 'x' * 19)
+
+    def test_iter_symbols(self):
+        L = lsystem.LSystem(sierpinski_spec, start_symbol='A')
+        for i in range(6):
+            self.assertEqual(''.join(L.iter_symbols(i)), L.run(i))
+        self.assertEqual(''.join(L.iter_symbols(2, init_str='AB')), L.run(2, init_str='AB'))
+
+    def test_iter_symbols_multi_char_heads(self):
+        L = lsystem.LSystem('S -> LlS; Ll -> rL; l -> lL;', start_symbol='S')
+        for i in range(6):
+            self.assertEqual(''.join(L.iter_symbols(i)), L.run(i))
+
+    def test_iter_symbols_deeper_than_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 100
+        self.assertEqual(''.join(lsystem.LSystem('A -> AB;', start_symbol='A').iter_symbols(depth)), 'A' + 'B' * depth)
+        self.assertEqual(''.join(lsystem.LSystem('A -> AB; Bc -> c;', start_symbol='A').iter_symbols(depth)),
+                         'A' + 'B' * depth)
+
+    def test_expansion_deeper_than_recursion_limit(self):
+        depth = sys.getrecursionlimit() + 100
+        L = lsystem.LSystem('A -> AB;', start_symbol='A')
+        self.assertEqual(L.run(depth), 'A' + 'B' * depth)
+        self.assertEqual(L.alphabet.decode(L.run_encoded(depth)), 'A' + 'B' * depth)
+        self.assertEqual(lsystem.LSystem('A -> AB; Bc -> c;', start_symbol='A').run(depth), 'A' + 'B' * depth)
+
+    def test_run_parallel(self):
+        for spec, start in [(sierpinski_spec, 'A'), ('S -> LlS; Ll -> rL; l -> lL; r -> Llr;', 'S')]:
+            L = lsystem.LSystem(spec, start_symbol=start)
+            for workers in [1, 2]:
+                for chunk_size in [1, 3, 50]:
+                    codes = L.run_parallel(7, workers=workers, chunk_size=chunk_size)
+                    self.assertEqual(L.alphabet.decode(codes), L.run(7))
+        L = lsystem.LSystem(sierpinski_spec, start_symbol='A')
+        for workers in [1, 2]:
+            codes = L.run_parallel(5, init_str='AXB', workers=workers, chunk_size=4)
+            self.assertEqual(L.alphabet_for('AXB').decode(codes), L.run(5, init_str='AXB'))
+
 
 if __name__ == '__main__':
     unittest.main()
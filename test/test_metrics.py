@@ -0,0 +1,39 @@
+import unittest
+from lsystems import curves
+from lsystems.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_run(self):
+        c = curves.Dragon()
+        finished = []
+        metrics = Metrics(callbacks=[finished.append])
+        svg = c.run(6, metrics=metrics)
+        self.assertEqual(svg, c.run(6))
+        self.assertEqual([r.name for r in metrics.stages], ['expand', 'post-process', 'turtle', 'serialize'])
+        self.assertEqual(finished, metrics.stages)
+        expand, post_process, turtle, serialize = metrics.stages
+        self.assertEqual(expand.symbols_out, len(c.lsys.run(6)))
+        self.assertEqual(post_process.symbols_in, expand.symbols_out)
+        self.assertEqual(turtle.symbols_in, post_process.symbols_out)
+        self.assertEqual(turtle.segments, c.segment_count(6))
+        self.assertEqual(serialize.output_bytes, len(svg) + 49)
+        self.assertEqual(set(metrics.seconds()), {'expand', 'post-process', 'turtle', 'serialize'})
+
+    def test_other_renders(self):
+        c = curves.Hendragon2()
+        metrics = Metrics(trace_memory=True)
+        c.run_image(3, size=(20, 20), metrics=metrics)
+        self.assertEqual([r.name for r in metrics.stages], ['expand', 'post-process', 'turtle', 'raster'])
+        self.assertTrue(all(r.peak_bytes > 0 for r in metrics.stages))
+        metrics = Metrics()
+        for generation in c.run_generations(2, metrics=metrics):
+            generation.svg
+        self.assertEqual([r.name for r in metrics.stages], ['expand', 'post-process', 'turtle', 'serialize'] * 3)
+        metrics = Metrics()
+        curves.Hilbert().run(4, resolution=30, metrics=metrics)
+        self.assertEqual([r.name for r in metrics.stages], ['compose', 'serialize'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import csv
+import os
+import tempfile
+import unittest
+from lsystems import curves
+from lsystems.plotting import draw_random_curves
+
+
+class FailingDragon(curves.Dragon):
+    def run_generations(self, *args, **kwargs):
+        raise RuntimeError("no generations")
+
+
+class IndexCheckingDragon(curves.Dragon):
+    # number of curves listed in results.csv whenever the next one is rendered
+    base_dir = ""
+    listed: list = []
+
+    def run_generations(self, *args, **kwargs):
+        with open(os.path.join(self.base_dir, "results.csv"), newline="") as f:
+            self.listed.append(len(list(csv.reader(f))) - 1)
+        return super().run_generations(*args, **kwargs)
+
+
+class TestPlotting(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def draw(self, Curve, name, **options):
+        base_dir = os.path.join(self.directory.name, name)
+        results = draw_random_curves(Curve, base_dir, num_curves=3, max_iters=2, thumbnail_size=(32, 32), **options)
+        with open(os.path.join(base_dir, "results.csv"), newline="") as f:
+            rows = list(csv.reader(f))
+        return results, rows
+
+    def test_same_curves_for_any_number_of_workers(self):
+        results, rows = self.draw(curves.Dragon, "one", workers=1)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(rows[0], ["index", "start_string", "filename", "error"])
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertTrue(os.path.exists(result.filename))
+        in_parallel, parallel_rows = self.draw(curves.Dragon, "two", workers=2)
+        self.assertEqual([(r.index, r.start_string, os.path.basename(r.filename), r.error) for r in results],
+                         [(r.index, r.start_string, os.path.basename(r.filename), r.error) for r in in_parallel])
+        self.assertEqual(sorted(row[:2] for row in rows[1:]), sorted(row[:2] for row in parallel_rows[1:]))
+
+    def test_failing_curve(self):
+        results, rows = self.draw(FailingDragon, "failing", workers=1)
+        self.assertEqual(len(results), 3)
+        for result, row in zip(results, rows[1:]):
+            self.assertIsNone(result.filename)
+            self.assertEqual(result.error, "RuntimeError: no generations")
+            self.assertEqual(row, [str(result.index), result.start_string, "", "RuntimeError: no generations"])
+
+    def test_results_written_incrementally(self):
+        IndexCheckingDragon.base_dir = os.path.join(self.directory.name, "incremental")
+        IndexCheckingDragon.listed = []
+        results, rows = self.draw(IndexCheckingDragon, "incremental", workers=1)
+        self.assertEqual(IndexCheckingDragon.listed, [0, 1, 2])
+        self.assertEqual(len(rows), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from lsystems import curves
+from lsystems.geometry import to_geometry
+from lsystems.raster import rasterize
+from lsystems.svg import Arc, Line
+
+
+class TestRaster(unittest.TestCase):
+    def test_line(self):
+        geometry = to_geometry('F', {'F': Line(length=8)})
+        pixels = np.asarray(rasterize(geometry, (10, 10), (-1, -5, 10, 10), stroke=2, antialias=1))
+        self.assertEqual(pixels.shape, (10, 10))
+        self.assertTrue(np.all(pixels[4:6, 1:9] == 0))
+        self.assertTrue(np.all(pixels[:3] == 255))
+        self.assertTrue(np.all(pixels[7:] == 255))
+
+    def test_arc_stays_on_circle(self):
+        # half circle of radius 10 around (0, -10)
+        geometry = to_geometry(')', {')': Arc(angle=180, rx=10, ry=10)})
+        np.testing.assert_allclose(geometry.vertices[-1], [0, -20], atol=1e-9)
+        pixels = np.asarray(rasterize(geometry, (40, 40), (-20, -30, 40, 40), stroke=1, antialias=1))
+        ys, xs = np.nonzero(pixels < 128)
+        distance = np.hypot(xs + 0.5 - 20, ys + 0.5 - 20)
+        self.assertTrue(np.all(np.abs(distance - 10) < 1.5))
+        self.assertEqual(xs.max() - xs.min() + 1, 11)
+
+    def test_run_image(self):
+        c = curves.Hilbert()
+        image = c.run_image(3, curved=True, size=(64, 48))
+        self.assertEqual(image.size, (64, 48))
+        pixels = np.asarray(image)
+        self.assertTrue(np.any(pixels == 255))
+        self.assertTrue(np.any(pixels < 255))
+        # antialiasing adds gray levels
+        self.assertGreater(len(np.unique(pixels)), 2)
+        self.assertEqual(set(np.unique(np.asarray(c.run_image(3, size=(64, 48), antialias=1)))), {0, 255})
+
+
+if __name__ == '__main__':
+    unittest.main()
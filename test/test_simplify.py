@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from lsystems import curves
+from lsystems.geometry import LINE, MOVE, to_geometry
+from lsystems.simplify import simplify
+from lsystems.svg import Line, Rotation
+
+
+class TestSimplify(unittest.TestCase):
+    def setUp(self):
+        self.movement_map = {'F': Line(length=1), 'O': Line(length=1, draw=False), 'Z': Line(length=0),
+                             '+': Rotation(angle=90), '-': Rotation(angle=-90), 'l': Rotation(angle=5),
+                             'r': Rotation(angle=-5)}
+
+    def test_merge_collinear_lines(self):
+        geometry = to_geometry('FFZF+FF++FOOF', self.movement_map)
+        simplified, removed = simplify(geometry)
+        np.testing.assert_allclose(simplified.vertices, [[0, 0], [3, 0], [3, -2], [3, -1], [3, 1], [3, 2]], atol=1e-9)
+        np.testing.assert_array_equal(simplified.commands, [LINE, LINE, LINE, MOVE, LINE])
+        self.assertEqual(removed, len(geometry) - 5)
+        self.assertEqual(simplified.bbox, geometry.bbox)
+
+    def test_douglas_peucker(self):
+        # a slightly bent line and a sharp corner
+        geometry = to_geometry('FlFrrFlF+FFFF', self.movement_map)
+        self.assertEqual(len(simplify(geometry)[0]), len(geometry) - 3)
+        simplified, removed = simplify(geometry, tolerance=0.2)
+        np.testing.assert_array_equal(simplified.commands, [LINE, LINE])
+        np.testing.assert_allclose(simplified.vertices[[0, -1]], geometry.vertices[[0, -1]])
+        self.assertEqual(removed, len(geometry) - 2)
+
+    def test_turtle_stage(self):
+        c = curves.FractalPlant()
+        svg = c.run(4)
+        c.turtle.simplify_tolerance = 0
+        self.assertLess(len(c.run(4)), len(svg))
+        self.assertGreater(c.turtle.removed_segments, 0)
+
+    def test_tolerance_of_every_geometry_path(self):
+        for curve_class, tolerance in [(curves.FractalPlant, 1), (curves.Hilbert, 0)]:
+            curve = curve_class(simplify_tolerance=tolerance)
+            traced = curve.run_geometry(4)
+            self.assertLess(len(traced), len(curve_class().run_geometry(4)))
+            for composed in [curve.run_geometry(4, composed=True), curve.run_geometry(4, resolution=1e9)]:
+                np.testing.assert_allclose(composed.vertices, traced.vertices, atol=1e-6)
+                np.testing.assert_array_equal(composed.commands, traced.commands)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from lsystems import curves
+from lsystems.lsystem import RewritePlan
+from lsystems.storage import GenerationStore
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_apply_prefix(self):
+        plan = RewritePlan({'ab': 'X', 'abc': 'Y', 'b': 'Z', 'bca': 'V'})
+        string = 'abcabbcababcbca'
+        for size in range(1, 5):
+            rewritten, rest = '', ''
+            for start in range(0, len(string), size):
+                prefix, rest = plan.apply_prefix(rest + string[start:start + size])
+                rewritten += prefix
+            self.assertEqual(rewritten + plan.apply(rest), plan.apply(string))
+
+    def test_generations_on_disk(self):
+        for curve_class in [curves.Dragon, curves.Hendragon2]:
+            lsys = curve_class().lsys
+            directory = os.path.join(self.directory.name, curve_class.__name__)
+            store = lsys.run_to_disk(4, directory, chunk_size=7)
+            for generation in range(5):
+                self.assertEqual(lsys.alphabet.decode(store.open(generation)), lsys.run(generation))
+                self.assertEqual(''.join(store.iter_strings(generation, chunk_size=5)), lsys.run(generation))
+            with self.assertRaises(ValueError):
+                GenerationStore(lsys, directory, init_str='FF')
+
+    def test_start_string_with_symbols_of_its_own(self):
+        lsys = curves.Sierpinski().lsys
+        store = lsys.run_to_disk(4, self.directory.name, init_str='AX', chunk_size=7)
+        self.assertEqual(''.join(store.iter_strings(4)), lsys.run(4, init_str='AX'))
+        c = curves.Hendragon()
+        store = c.lsys.run_to_disk(3, os.path.join(self.directory.name, 'hendragon'), init_str='MF+')
+        streamed, expected = io.StringIO(), io.StringIO()
+        c.stream_svg(3, out=streamed, store=store)
+        c.stream_svg(3, out=expected, init_str='MF+')
+        self.assertEqual(streamed.getvalue(), expected.getvalue())
+
+    def test_resume(self):
+        lsys = curves.Hendragon2().lsys
+        calls = []
+
+        def interrupt(fd):
+            calls.append(fd)
+            if len(calls) == 40:
+                raise KeyboardInterrupt
+
+        with mock.patch('lsystems.storage.os.fsync', side_effect=interrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                lsys.run_to_disk(4, self.directory.name, chunk_size=5)
+        store = GenerationStore(lsys, self.directory.name, chunk_size=5)
+        self.assertLess(store.completed(), 4)
+        self.assertEqual(lsys.alphabet.decode(store.run(4)), lsys.run(4))
+
+    def test_stream_svg_from_disk(self):
+        for curve, curved in [(curves.Hilbert(), False), (curves.Hendragon2(), False), (curves.Sierpinski(), True)]:
+            store = curve.lsys.run_to_disk(4, os.path.join(self.directory.name, type(curve).__name__),
+                                           chunk_size=16)
+            expected, streamed = io.StringIO(), io.StringIO()
+            curve.stream_svg(4, out=expected, curved=curved)
+            curve.stream_svg(4, out=streamed, curved=curved, store=store)
+            self.assertEqual(streamed.getvalue(), expected.getvalue())
+            codes = np.concatenate(list(curve.iter_stored(store, 4, curved=curved))) \
+                if curve.lsys.is_context_free() and not curved else None
+            if codes is not None:
+                np.testing.assert_array_equal(codes, curve.run_encoded(4, curved=curved))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from lsystems.svg import Line, Rotation, Arc, PopPosition, PushPosition, Cursor
+from lsystems.svg import Line, Rotation, Arc, PopPosition, PushPosition, Cursor, Movement
 
 
 class TestSvg(unittest.TestCase):
@@ -58,6 +58,38 @@ class TestSvg(unittest.TestCase):
         self.assertEqual(pop_segment, "M 11.0000 10.0000")
         self.assertEqual(len(stack), 0)
 
+    def test_advance_matches_generate(self):
+        stack = []
+        movements = [Line(length=20), Line(length=3, draw=False), Rotation(angle=122), Arc(angle=90, rx=10, ry=10),
+                     Arc(angle=-200, rx=4, ry=7), PushPosition(stack=stack), Line(length=5), PopPosition(stack=stack)]
+        cursor = Cursor(x=11, y=10, dir=90)
+        generated = Cursor(x=11, y=10, dir=90)
+        for movement in movements:
+            movement.advance(cursor)
+            _, generated = movement.generate(generated)
+            self.assertEqual(cursor, generated, f"Wrong Cursor after {type(movement).__name__}: {cursor}")
+        self.assertEqual(len(stack), 0)
+
+    def test_advance_push_copies_cursor(self):
+        stack = []
+        cursor = Cursor(x=11, y=10, dir=90)
+        PushPosition(stack=stack).advance(cursor)
+        Line(length=20).advance(cursor)
+
+        self.assertEqual(stack[0], Cursor(x=11, y=10, dir=90), f"Wrong Cursor: {stack[0]}")
+        PopPosition(stack=stack).advance(cursor)
+        self.assertEqual(cursor, Cursor(x=11, y=10, dir=90), f"Wrong Cursor: {cursor}")
+
+    def test_advance_of_movement_without_it(self):
+        class Jump(Movement):
+            def generate(self, start_cursor):
+                end_cursor = Cursor(x=start_cursor.x + 1, y=start_cursor.y + 2, dir=start_cursor.dir + 3)
+                return f"M {end_cursor.x:0.4f} {end_cursor.y:0.4f}", end_cursor
+
+        cursor = Cursor(x=11, y=10, dir=90)
+        Jump().advance(cursor)
+        self.assertEqual(cursor, Cursor(x=12, y=12, dir=93), f"Wrong Cursor: {cursor}")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from lsystems import curves, tiles
+from lsystems.geometry import ARC, MOVE
+
+
+class TestTiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_pyramid(self):
+        c = curves.Hilbert()
+        index = c.export_tiles(6, self.directory.name, max_segments=300)
+        geometry = c.run_geometry(6)
+        self.assertGreater(index['levels'], 2)
+        for tile in index['tiles']:
+            self.assertLessEqual(tile['segments'], 300)
+            with open(os.path.join(self.directory.name, tile['file']), encoding='utf-8') as f:
+                self.assertTrue(f.read().startswith('<?xml'))
+        # every drawn segment is in one of the tiles that are not split any further
+        leaves = [t for t in index['tiles'] if t['leaf']]
+        self.assertTrue(all(t['source_segments'] <= 300 for t in leaves))
+        self.assertGreaterEqual(sum(t['source_segments'] for t in leaves),
+                                np.count_nonzero(geometry.commands != MOVE))
+        self.assertEqual(len(index['tiles']), len({(t['level'], t['x'], t['y']) for t in index['tiles']}))
+
+    def test_only_changed_tiles_are_written(self):
+        c = curves.Dragon()
+        index = c.export_tiles(8, self.directory.name, max_segments=50)
+
+        def modification_times():
+            return {t['file']: os.stat(os.path.join(self.directory.name, t['file'])).st_mtime_ns
+                    for t in index['tiles']}
+
+        before = modification_times()
+        for tile in index['tiles']:
+            os.utime(os.path.join(self.directory.name, tile['file']), ns=(1, 1))
+        self.assertEqual(c.export_tiles(8, self.directory.name, max_segments=50), index)
+        self.assertEqual(set(modification_times().values()), {1})
+        # a thicker line changes every tile
+        c.turtle.stroke = 6
+        index = c.export_tiles(8, self.directory.name, max_segments=50)
+        self.assertNotIn(1, set(modification_times().values()))
+        self.assertEqual(set(modification_times()), set(before))
+
+    def test_stale_tiles_are_removed(self):
+        c = curves.Dragon()
+        deep = c.export_tiles(8, self.directory.name, max_segments=50)
+        index = c.export_tiles(8, self.directory.name, max_segments=200)
+        self.assertLess(index['levels'], deep['levels'])
+        files = {os.path.relpath(os.path.join(root, name), self.directory.name)
+                 for root, _, names in os.walk(self.directory.name) for name in names}
+        self.assertEqual(files, {t['file'] for t in index['tiles']} | {tiles.INDEX_FILENAME})
+        # no empty directories are left behind
+        for root, directories, names in os.walk(self.directory.name):
+            self.assertTrue(directories or names, root)
+
+    def test_png(self):
+        c = curves.Sierpinski()
+        index = c.export_tiles(6, self.directory.name, max_segments=200, image_format='png', tile_size=64)
+        for tile in index['tiles']:
+            with Image.open(os.path.join(self.directory.name, tile['file'])) as image:
+                self.assertEqual(image.size, (64, 64))
+        with self.assertRaises(ValueError):
+            c.export_tiles(6, self.directory.name, image_format='pdf')
+
+    def test_empty_selection(self):
+        c = curves.Hilbert()
+        with self.assertRaises(ValueError):
+            c.export_tiles(3, self.directory.name, max_segments=1)
+        geometry = c.run_geometry(3)
+        empty = tiles._select(geometry, np.empty(0, dtype=np.int64), np.cumsum(geometry.commands == ARC) - 1)
+        self.assertEqual(len(empty), 0)
+        path = os.path.join(self.directory.name, 'empty.svg')
+        tiles._write_tile(c.turtle, empty, path, (0, 0, 10, 10), 16, 'svg', 4, 4)
+        self.assertTrue(os.path.exists(path))
+        index = c.export_tiles(3, self.directory.name, max_segments=2, max_level=1)
+        self.assertTrue(all(t['segments'] <= 2 for t in index['tiles']))
+
+    def test_start_string_with_symbols_of_its_own(self):
+        c = curves.Sierpinski()
+        index = c.export_tiles(5, self.directory.name, init_str='AX', max_segments=100)
+        geometry = c.run_geometry(5, init_str='AX')
+        self.assertGreaterEqual(sum(t['source_segments'] for t in index['tiles'] if t['leaf']),
+                                np.count_nonzero(geometry.commands != MOVE))
+
+
+if __name__ == '__main__':
+    unittest.main()
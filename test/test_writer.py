@@ -0,0 +1,49 @@
+import io
+import unittest
+from lsystems import curves
+from lsystems.turtle import SimpleTurtle
+
+
+def path_data(turtle, sequence, **kwargs):
+    out = io.StringIO()
+    turtle.writeSvg(sequence, out, **kwargs)
+    svg = out.getvalue()
+    return svg[svg.index(' d="') + 4:svg.index('" fill=')]
+
+
+class TestWriter(unittest.TestCase):
+    def test_collapse_lines(self):
+        t = SimpleTurtle(90, 10, 100)
+        self.assertEqual(path_data(t, 'F+F-F'), 'M0 0 L10 0 10 -10 20 -10')
+        self.assertEqual(path_data(t, 'F+F-F', relative=True), 'm0 0 l10 0 0 -10 10 0')
+
+    def test_skip_no_op_moves(self):
+        t = SimpleTurtle(90, 10, 100)
+        self.assertEqual(path_data(t, 'OOF'), 'M20 0 L30 0')
+        self.assertEqual(path_data(t, 'F[+F]F'), 'M0 0 L10 0 10 -10 M10 0 L20 0')
+        self.assertEqual(path_data(t, 'FO'), 'M0 0 L10 0')
+
+    def test_arcs_and_precision(self):
+        t = SimpleTurtle(90, 10, 100)
+        self.assertEqual(path_data(t, 'F)F(', relative=True),
+                         'm0 0 l10 0 a10 10 0 0 0 10 -10 l0 -10 a10 10 -90 0 1 10 -10')
+        t = SimpleTurtle(60, 10, 100)
+        self.assertEqual(path_data(t, '+F', precision=2), 'M0 0 L5 -8.66')
+
+    def test_same_drawing_as_svgwrite(self):
+        d = curves.Dragon()
+        out = io.StringIO()
+        d.write_svg(4, out, curved=True)
+        self.assertIn(d.run_curved(4).split(' d=')[0], out.getvalue())
+
+    def test_stream_svg(self):
+        for curve, curved in [(curves.Dragon(), True), (curves.FractalPlant(), False)]:
+            out = io.StringIO()
+            curve.write_svg(4, out, curved=curved)
+            streamed = io.StringIO()
+            curve.stream_svg(4, streamed, curved=curved)
+            self.assertEqual(streamed.getvalue().split(' d=')[1], out.getvalue().split(' d=')[1])
+
+
+if __name__ == '__main__':
+    unittest.main()